@@ -0,0 +1,203 @@
+"""
+Benchmark of KR-WordRank stages over the corpora in data/.
+
+Each corpus is replicated `scale` times to show how each stage scales,
+and elapsed time (best of `--repeat` runs) and peak Python memory
+(tracemalloc) of each stage are written into a JSON file.
+
+    $ python benchmarks/benchmark.py --scales 1 10 100 --output result.json
+    $ python benchmarks/benchmark.py --output new.json --compare result.json
+
+With `--compare`, stages which are slower than the baseline by more than
+`--tolerance` are reported, and the script exits with status 1.
+"""
+
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from krwordrank.about import __version__
+from krwordrank.graph import hits
+from krwordrank.sentence import KeywordVectorizer
+from krwordrank.sentence import MaxScoreTokenizer
+from krwordrank.sentence import make_vocab_score
+from krwordrank.sentence import summarize_with_sentences
+from krwordrank.sentence._sentence import select
+from krwordrank.word import KRWordRank
+
+
+STAGES = ['scan_vocabs', 'construct_word_graph', 'hits', 'select_keywords',
+    'filter_compounds', 'filter_subtokens', 'tokenize', 'vectorize', 'select',
+    'summarize_with_sentences']
+
+
+def load_corpus(path, max_docs=-1):
+    with open(path, encoding='utf-8') as f:
+        docs = [line.split('\t')[0].strip() for line in f]
+    if max_docs > 0:
+        docs = docs[:max_docs]
+    return docs
+
+def measure(func, repeat, memory):
+    """
+    Returns
+    -------
+    output : anything
+        Output of the last run
+    elapsed : float
+        Minimum elapsed seconds of the runs
+    peak_memory : int or None
+        Peak bytes allocated by Python during the first run
+    """
+    peak_memory = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        output = func()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    elapsed = []
+    for _ in range(repeat):
+        gc.collect()
+        begin = time.perf_counter()
+        output = func()
+        elapsed.append(time.perf_counter() - begin)
+    return output, min(elapsed), peak_memory
+
+def benchmark_corpus(texts, args):
+    """
+    It runs each stage in the order of training, and the output of a stage
+    is used as the input of the next stage.
+    """
+    results = {}
+    def run(stage, func):
+        output, elapsed, peak_memory = measure(func, args.repeat, args.memory)
+        results[stage] = {'elapsed': elapsed, 'peak_memory': peak_memory}
+        if args.verbose:
+            print('  %-24s %9.4f sec' % (stage, elapsed), flush=True)
+        return output
+
+    extractor = KRWordRank(min_count=args.min_count, max_length=args.max_length)
+    run('scan_vocabs', lambda: extractor.scan_vocabs(texts))
+    graph = run('construct_word_graph', lambda: extractor._construct_word_graph(texts))
+    rank = run('hits', lambda: hits(graph, args.beta, args.max_iter,
+        sum_weight=extractor.sum_weight, number_of_nodes=len(extractor.vocabulary), verbose=False))
+
+    tokens = {idx:extractor.int2token(idx) for idx in rank}
+    lset = {token[0]:rank[idx] for idx, token in tokens.items() if token[1] == 'L'}
+    rset = {token[0]:rank[idx] for idx, token in tokens.items() if token[1] == 'R'}
+    keywords = run('select_keywords', lambda: extractor._select_keywords(lset, rset))
+    keywords = run('filter_compounds', lambda: extractor._filter_compounds(keywords))
+    keywords = run('filter_subtokens', lambda: extractor._filter_subtokens(keywords))
+
+    vocab_score = make_vocab_score(keywords, {}, scaling=np.sqrt, topk=args.num_keywords)
+    # cache is disabled to measure segmentation itself
+    tokenizer = MaxScoreTokenizer(vocab_score, cache_size=0)
+    run('tokenize', lambda: [tokenizer.tokenize(text) for text in texts])
+    vectorizer = KeywordVectorizer(tokenizer.tokenize, vocab_score)
+    x = run('vectorize', lambda: vectorizer.vectorize(texts))
+    keyvec = vectorizer.keyword_vector.reshape(1,-1)
+    initial_penalty = np.zeros(len(texts))
+    run('select', lambda: select(x, keyvec, texts, initial_penalty, args.num_keysents))
+
+    run('summarize_with_sentences', lambda: summarize_with_sentences(texts,
+        num_keywords=args.num_keywords, num_keysents=args.num_keysents,
+        min_count=args.min_count, max_length=args.max_length,
+        beta=args.beta, max_iter=args.max_iter))
+    return results
+
+def compare(results, baseline, tolerance, min_elapsed):
+    def key(record):
+        return (record['corpus'], record['scale'], record['stage'])
+    base = {key(record):record for record in baseline['results']}
+    regressions = []
+    for record in results['results']:
+        prev = base.get(key(record))
+        # very short stages are dominated by timer noise
+        if prev is None or max(prev['elapsed'], record['elapsed']) < min_elapsed:
+            continue
+        ratio = record['elapsed'] / prev['elapsed']
+        if ratio > 1 + tolerance:
+            regressions.append((key(record), prev['elapsed'], record['elapsed'], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark KR-WordRank stages')
+    parser.add_argument('--data', type=str, nargs='*', default=None,
+        help='Corpus paths. Default is data/*_norm.txt')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 5, 10],
+        help='Corpus replication factors')
+    parser.add_argument('--max_docs', type=int, default=-1, help='Number of documents of each corpus')
+    parser.add_argument('--repeat', type=int, default=1, help='Number of timed runs of each stage')
+    parser.add_argument('--no_memory', dest='memory', action='store_false',
+        help='Skip tracemalloc run for peak memory')
+    parser.add_argument('--min_count', type=int, default=5)
+    parser.add_argument('--max_length', type=int, default=10)
+    parser.add_argument('--beta', type=float, default=0.85)
+    parser.add_argument('--max_iter', type=int, default=10)
+    parser.add_argument('--num_keywords', type=int, default=100)
+    parser.add_argument('--num_keysents', type=int, default=10)
+    parser.add_argument('--output', type=str, default='benchmark.json', help='JSON result path')
+    parser.add_argument('--compare', type=str, default=None, help='Baseline JSON result path')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+        help='Allowed relative slowdown compared with baseline')
+    parser.add_argument('--min_elapsed', type=float, default=0.01,
+        help='Stages faster than this seconds are not compared')
+    parser.add_argument('--verbose', dest='verbose', action='store_true')
+    args = parser.parse_args()
+
+    paths = args.data
+    if not paths:
+        data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+        paths = sorted(glob.glob(os.path.join(data_dir, '*_norm.txt')))
+
+    records = []
+    for path in paths:
+        corpus = load_corpus(path, args.max_docs)
+        for scale in args.scales:
+            texts = corpus * scale
+            if args.verbose:
+                print('%s x%d (%d docs)' % (os.path.basename(path), scale, len(texts)), flush=True)
+            for stage, result in benchmark_corpus(texts, args).items():
+                records.append({
+                    'corpus': os.path.basename(path),
+                    'scale': scale,
+                    'num_docs': len(texts),
+                    'stage': stage,
+                    'elapsed': result['elapsed'],
+                    'peak_memory': result['peak_memory']
+                })
+
+    results = {
+        'krwordrank_version': __version__,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'arguments': vars(args),
+        'results': records
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print('saved %d records in %s' % (len(records), args.output))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_elapsed)
+        for (corpus, scale, stage), prev, curr, ratio in regressions:
+            print('regression: %s x%d %s %.4f -> %.4f sec (x%.2f)' % (corpus, scale, stage, prev, curr, ratio))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
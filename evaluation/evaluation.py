@@ -1,4 +1,9 @@
 from collections import namedtuple
+import numpy as np
+
+from krwordrank.sentence import keysentence
+from krwordrank.sentence import make_vocab_score
+from krwordrank.sentence import MaxScoreTokenizer
 
 Performance = namedtuple('Performance', 'n_keywords n_keysents rouge1'.split())
 
@@ -38,3 +43,52 @@ def rouge1(keywords, keysents, tokenize, n_keywords=None, n_keysents=None):
             recall = len(word_set) / n_keyword
             performance.append(Performance(n_keyword, n_keysent, recall))
     return performance
+
+def rouge1_evaluator(texts, n_keywords=None, n_keysents=None, stopwords=None,
+    scaling=None, diversity=0.3):
+    """
+    It returns evaluate function for `KRWordRank.sweep`. The function selects key-sentences
+    with the keywords like `summarize_with_sentences`, and measures `rouge1` of them.
+
+        >>> evaluate = rouge1_evaluator(texts, n_keywords=[10, 30], n_keysents=[5])
+        >>> results = KRWordRank().sweep(texts, min_count=[3, 5], beta=[0.8, 0.85], evaluate=evaluate)
+        >>> for result in results:
+        >>>     print(result.min_count, result.beta, result.elapsed, result.score)
+
+    Arguments
+    ---------
+    texts : list of str
+        Sentences where key-sentences are selected
+    n_keywords : list of int or None
+        If None, n_keywords = [10, 20, 30, 50, 100]
+    n_keysents: list of int or None
+        If None, n_keysents = [3, 5, 10, 20, 30]
+    stopwords : None or set of str
+        Stopwords list for keyword and key-sentence extraction
+    scaling : None or callable
+        Keyword score scaling function. Default is numpy.sqrt
+    diversity : float
+        Minimum cosine distance between top ranked sentence and others
+
+    Returns
+    -------
+    evaluate : callable
+        keywords -> list of Performance
+    """
+    if n_keywords is None:
+        n_keywords = [10, 20, 30, 50, 100]
+    if n_keysents is None:
+        n_keysents = [3, 5, 10, 20, 30]
+    if stopwords is None:
+        stopwords = {}
+    if scaling is None:
+        scaling = np.sqrt
+
+    def evaluate(keywords):
+        vocab_score = make_vocab_score(keywords, stopwords, scaling=scaling, topk=max(n_keywords))
+        tokenizer = MaxScoreTokenizer(scores=vocab_score)
+        keysents = keysentence(vocab_score, texts, tokenizer.tokenize, max(n_keysents), diversity)
+        keywords_ = {word:keywords[word] for word in vocab_score}
+        return rouge1(keywords_, keysents, tokenizer.tokenize, n_keywords, n_keysents)
+
+    return evaluate
@@ -3,7 +3,11 @@ import warnings
 if sys.version_info.major < 3:
     warnings.warn('Some functions may not work. We recommend python >= 3.5+')
 
+from . import corpus
 from . import graph
 from . import hangle
+from . import instrument
+from . import pipeline
 from . import sentence
+from . import service
 from . import word
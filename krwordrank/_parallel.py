@@ -0,0 +1,126 @@
+import math
+import os
+import pickle
+import tempfile
+import uuid
+from functools import partial
+from itertools import islice
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+
+
+def get_n_jobs(n_jobs):
+    """
+    Arguments
+    ---------
+    n_jobs : int
+        Number of worker processes. If it is negative,
+        it uses (number of cores + 1 + n_jobs) processes like joblib.
+
+    Returns
+    -------
+    n_jobs : int
+        Positive number of processes
+    """
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, cpu_count() + 1 + n_jobs)
+    return n_jobs
+
+def chunked(docs, n_jobs, chunk_size=None):
+    """
+    It splits docs into contiguous chunks. The order of docs is preserved.
+
+    Arguments
+    ---------
+    docs : iterable of str
+        Documents
+    n_jobs : int
+        Number of worker processes
+    chunk_size : None or int
+        Number of documents in a chunk. If None, it splits a list into
+        four chunks per worker, and an iterator into 10000 documents chunks.
+
+    Yields
+    ------
+    chunk : list of str
+    """
+    if chunk_size is None:
+        if hasattr(docs, '__len__'):
+            chunk_size = max(1, math.ceil(len(docs) / (4 * n_jobs)))
+        else:
+            chunk_size = 10000
+    docs = iter(docs)
+    while True:
+        chunk = list(islice(docs, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+def parallel_map(func, chunks, n_jobs, initializer=None, initargs=(), pool=None):
+    """
+    It applies func to each chunk with n_jobs processes.
+    The results are yielded in the order of chunks.
+
+    Arguments
+    ---------
+    func : callable
+        Picklable function, such as module level function
+    chunks : iterable
+        Inputs of func
+    n_jobs : int
+        Number of worker processes. If it is 1, it does not use process pool
+    initializer : None or callable
+        Worker process initializer
+    initargs : tuple
+        Arguments of initializer
+    pool : None or multiprocessing.pool.Pool
+        If it is given, it uses the existing pool instead of creating new one.
+        Because the workers of existing pool are already initialized, initargs are
+        pickled once into a temporal file, and each task sends only its path.
+        Each worker loads initargs once, and initializer is called with each chunk.
+
+    Yields
+    ------
+    func(chunk)
+    """
+    if pool is not None:
+        if initializer is None:
+            for result in pool.imap(func, chunks):
+                yield result
+            return
+        fd, path = tempfile.mkstemp(prefix='krwordrank_', suffix='.pkl')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(initargs, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # the path of removed file may be reused, thus a unique key identifies initargs
+            func = partial(_initialize_and_call, func, initializer, (path, uuid.uuid4().hex))
+            for result in pool.imap(func, chunks):
+                yield result
+        finally:
+            os.remove(path)
+        return
+
+    if n_jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    with Pool(n_jobs, initializer=initializer, initargs=initargs) as pool:
+        for result in pool.imap(func, chunks):
+            yield result
+
+# (key, initargs) loaded last in this worker process
+_loaded_initargs = (None, None)
+
+def _initialize_and_call(func, initializer, key, chunk):
+    global _loaded_initargs
+    if _loaded_initargs[0] != key:
+        with open(key[0], 'rb') as f:
+            _loaded_initargs = (key, pickle.load(f))
+    # the other tasks of the pool may change the state of worker, thus it is initialized every time
+    initializer(*_loaded_initargs[1])
+    return func(chunk)
@@ -0,0 +1,4 @@
+from ._corpus import DocumentCorpus
+from ._corpus import GeneratorCorpus
+from ._corpus import as_reiterable
+from ._corpus import parse_line
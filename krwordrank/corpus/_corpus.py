@@ -0,0 +1,123 @@
+class DocumentCorpus:
+    """
+    Re-iterable document stream over a text file. It reads the file lazily
+    every time it is iterated, so the corpus is not loaded in memory.
+
+        >>> corpus = DocumentCorpus('data/134963_norm.txt', column=0)
+        >>> for doc in corpus:
+        >>>     # do something
+
+    Arguments
+    ---------
+    path : str
+        Text file path. A line is a document.
+    column : None or int
+        If it is not None, each line is splitted with delimiter and
+        only the column-th field is used as document.
+    delimiter : str
+        Column delimiter. Default is '\\t'
+    preprocess : None or callable
+        Function applied to each document. str -> str
+        For example, krwordrank.hangle.normalize
+    num_docs : int
+        Maximum number of documents. If it is negative, it yields all lines.
+        Default is -1
+    encoding : str
+        File encoding. Default is 'utf-8'
+    """
+
+    def __init__(self, path, column=None, delimiter='\t', preprocess=None,
+        num_docs=-1, encoding='utf-8'):
+
+        self.path = path
+        self.column = column
+        self.delimiter = delimiter
+        self.preprocess = preprocess
+        self.num_docs = num_docs
+        self.encoding = encoding
+
+    def __iter__(self):
+        with open(self.path, encoding=self.encoding) as f:
+            for i, line in enumerate(f):
+                if 0 <= self.num_docs <= i:
+                    break
+                yield self._parse(line)
+
+    def _parse(self, line):
+        doc = parse_line(line, self.column, self.delimiter)
+        if self.preprocess is not None:
+            doc = self.preprocess(doc)
+        return doc
+
+
+def parse_line(line, column=None, delimiter='\t'):
+    """
+    It parses a line of text file into a document same with `DocumentCorpus`
+
+    Arguments
+    ---------
+    line : str
+        A line of text file
+    column : None or int
+        If it is not None, the line is splitted with delimiter and
+        only the column-th field is used as document.
+        If the line has less fields, the document is empty.
+    delimiter : str
+        Column delimiter. Default is '\\t'
+
+    Returns
+    -------
+    doc : str
+        Stripped document
+    """
+    if column is not None:
+        columns = line.rstrip('\n').split(delimiter)
+        line = columns[column] if column < len(columns) else ''
+    return line.strip()
+
+
+class GeneratorCorpus:
+    """
+    Re-iterable document stream from generator factory.
+
+        >>> def read_docs():
+        >>>     for doc in database.query(...):
+        >>>         yield doc
+        >>> corpus = GeneratorCorpus(read_docs)
+
+    Arguments
+    ---------
+    factory : callable
+        Function that returns a new iterator of str whenever it is called.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+
+    def __iter__(self):
+        return iter(self.factory())
+
+
+def as_reiterable(docs):
+    """
+    KR-WordRank iterates docs twice; once for scanning subwords and
+    once for constructing subword graph. It converts docs into re-iterable object.
+
+    Arguments
+    ---------
+    docs : list of str, str, callable or re-iterable object
+        If it is str, it is treated as a file path.
+        If it is callable, it is treated as generator factory.
+
+    Returns
+    -------
+    docs : re-iterable object
+    """
+    if isinstance(docs, str):
+        return DocumentCorpus(docs)
+    if callable(docs):
+        return GeneratorCorpus(docs)
+    if iter(docs) is docs:
+        raise ValueError('docs is a one-pass iterator. Use list of str, '
+            'file path, generator factory or DocumentCorpus instead')
+    return docs
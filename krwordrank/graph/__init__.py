@@ -1 +1,5 @@
 from ._rank import hits
+from ._rank import hits_csr
+from ._rank import hits_batch
+from ._rank import dict_to_csr
+from ._rank import Iteration
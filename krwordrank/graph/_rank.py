@@ -1,5 +1,16 @@
+from collections import namedtuple
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+Iteration = namedtuple('Iteration', 'num_iter residual elapsed'.split())
+STOP_RULES = ('l1', 'relative_l1', 'linf')
+
+
 def hits(graph, beta, max_iter=50, bias=None, verbose=True, 
-    sum_weight=100, number_of_nodes=None, converge=0.001):
+    sum_weight=100, number_of_nodes=None, converge=0.001, initial_rank=None,
+    stop_rule='l1', max_time=None, callback=None, return_history=False):
     """
     It trains rank of node using HITS algorithm.
 
@@ -22,11 +33,29 @@ def hits(graph, beta, max_iter=50, bias=None, verbose=True,
     converge : float
         Minimum rank difference between previous step and current step.
         If the difference is smaller than converge, it do early-stop.
+    initial_rank : None or dict
+        Warm-start rank {int:float}. The nodes not in initial_rank start
+        from sum_weight / number_of_nodes
+    stop_rule : str
+        Early-stop rule. Choose one of ['l1', 'relative_l1', 'linf']
+        'l1' : sum of rank differences < sum_weight * converge
+        'relative_l1' : sum of rank differences / sum of ranks < converge
+        'linf' : maximum rank difference < converge * sum_weight / number_of_nodes
+        Default is 'l1'
+    max_time : None or float
+        If it is not None, it stops after iteration which exceeds max_time seconds.
+    callback : None or callable
+        It is called after each iteration as callback(num_iter, residual, elapsed).
+        residual is the value compared by stop_rule, and elapsed is wall time in seconds.
+    return_history : Boolean
+        If True, it returns also the list of Iteration(num_iter, residual, elapsed)
 
     Returns
     -------
     rank : dict
         Rank dictionary formed as {int:float}.
+    history : list of Iteration
+        Only if return_history is True
     """
 
     if not bias:
@@ -34,31 +63,30 @@ def hits(graph, beta, max_iter=50, bias=None, verbose=True,
     if not number_of_nodes:
         number_of_nodes = max(len(graph), len(bias))
 
-    if number_of_nodes <= 1:
-        raise ValueError(
-            'The graph should consist of at least two nodes\n',
-            'The node size of inserted graph is %d' % number_of_nodes
-        )
+    _check_number_of_nodes(number_of_nodes)
+    threshold = _threshold(stop_rule, converge, sum_weight, number_of_nodes)
 
     dw = sum_weight / number_of_nodes
-    rank = {node:dw for node in graph.keys()}
+    if initial_rank:
+        rank = {node:initial_rank.get(node, dw) for node in graph.keys()}
+    else:
+        rank = {node:dw for node in graph.keys()}
 
+    history = []
+    begin_time = time.perf_counter()
     for num_iter in range(1, max_iter + 1):
         rank_ = _update(rank, graph, bias, dw, beta)
-        diff = sum((abs(w - rank.get(n, 0)) for n, w in rank_.items()))
+        diff = [abs(w - rank.get(n, 0)) for n, w in rank_.items()]
+        residual = _residual(stop_rule, diff, rank_.values())
         rank = rank_
-
-        if diff < sum_weight * converge:
-            if verbose:
-                print('\riter = %d Early stopped.' % num_iter, end='', flush=True)
+        if _is_stopped(num_iter, residual, threshold, begin_time, max_time, verbose, callback, history):
             break
 
-        if verbose:
-            print('\riter = %d' % num_iter, end='', flush=True)
-
     if verbose:
         print('\rdone')
 
+    if return_history:
+        return rank, history
     return rank
 
 def _update(rank, graph, bias, dw, beta):
@@ -66,4 +94,258 @@ def _update(rank, graph, bias, dw, beta):
     for to_node, from_dict in graph.items():
         rank_new[to_node] = sum([w * rank[from_node] for from_node, w in from_dict.items()])
         rank_new[to_node] = beta * rank_new[to_node] + (1 - beta) * bias.get(to_node, dw)
-    return rank_new
\ No newline at end of file
+    return rank_new
+
+def hits_csr(graph, beta, max_iter=50, bias=None, verbose=True,
+    sum_weight=100, number_of_nodes=None, converge=0.001, initial_rank=None,
+    stop_rule='l1', max_time=None, callback=None, return_history=False):
+    """
+    It trains rank of node using HITS algorithm with sparse matrix operations.
+    The update rule and the early-stop condition are same with `hits`,
+    but each iteration is computed as a sparse matrix - dense vector product.
+
+    Arguments
+    ---------
+    graph : scipy.sparse.csr_matrix
+        (n nodes, n nodes) shape inbound subword graph. graph[to, from] = float
+    beta : float
+        PageRank damping factor
+    max_iter : int
+        Maximum number of iterations
+    bias : None or numpy.ndarray
+        (n nodes,) shape dense bias vector.
+        If None, all nodes have uniform bias, sum_weight / number_of_nodes
+    verbose : Boolean
+        If True, it shows training progress.
+    sum_weight : float
+        Sum of weights of all nodes in graph
+    number_of_nodes : None or int
+        Number of nodes in graph
+    converge : float
+        Minimum rank difference between previous step and current step.
+        If the difference is smaller than converge, it do early-stop.
+    initial_rank : None or numpy.ndarray
+        (n nodes,) shape warm-start rank vector.
+        If None, all nodes start from sum_weight / number_of_nodes
+    stop_rule : str
+        Early-stop rule. Choose one of ['l1', 'relative_l1', 'linf']
+        'l1' : sum of rank differences < sum_weight * converge
+        'relative_l1' : sum of rank differences / sum of ranks < converge
+        'linf' : maximum rank difference < converge * sum_weight / number_of_nodes
+        Default is 'l1'
+    max_time : None or float
+        If it is not None, it stops after iteration which exceeds max_time seconds.
+    callback : None or callable
+        It is called after each iteration as callback(num_iter, residual, elapsed).
+        residual is the value compared by stop_rule, and elapsed is wall time in seconds.
+    return_history : Boolean
+        If True, it returns also the list of Iteration(num_iter, residual, elapsed)
+
+    Returns
+    -------
+    rank : dict
+        Rank dictionary formed as {int:float}.
+        Only the nodes which have inbound edges are included, same with `hits`
+    history : list of Iteration
+        Only if return_history is True
+    """
+
+    if not number_of_nodes:
+        number_of_nodes = graph.shape[0]
+
+    _check_number_of_nodes(number_of_nodes)
+    threshold = _threshold(stop_rule, converge, sum_weight, number_of_nodes)
+
+    graph = csr_matrix(graph)
+    dw = sum_weight / number_of_nodes
+    if bias is None:
+        bias = np.full(graph.shape[0], dw)
+    bias = np.asarray(bias, dtype=np.float64)
+
+    nodes = np.diff(graph.indptr) > 0
+    if initial_rank is None:
+        rank = np.where(nodes, dw, 0.0)
+    else:
+        rank = np.where(nodes, np.asarray(initial_rank, dtype=np.float64), 0.0)
+    bias = (1 - beta) * np.where(nodes, bias, 0.0)
+
+    history = []
+    begin_time = time.perf_counter()
+    for num_iter in range(1, max_iter + 1):
+        rank_ = beta * graph.dot(rank) + bias
+        residual = _residual(stop_rule, np.abs(rank_ - rank), rank_)
+        rank = rank_
+        if _is_stopped(num_iter, residual, threshold, begin_time, max_time, verbose, callback, history):
+            break
+
+    if verbose:
+        print('\rdone')
+
+    rank = {int(node):float(rank[node]) for node in np.where(nodes)[0]}
+    if return_history:
+        return rank, history
+    return rank
+
+def hits_batch(graph, beta, max_iter=50, biases=None, verbose=True,
+    sum_weight=100, number_of_nodes=None, converge=0.001,
+    stop_rule='l1', max_time=None, callback=None):
+    """
+    It trains ranks of many bias vectors over one graph. Each iteration is
+    a sparse matrix - dense matrix product, graph (n nodes, n nodes) times
+    rank (n nodes, n biases). The rank of each bias is same with `hits_csr`
+    with the bias. Early-stop is checked for each bias, and the ranks which
+    have stopped are not updated anymore.
+
+    Arguments
+    ---------
+    graph : scipy.sparse.csr_matrix
+        (n nodes, n nodes) shape inbound subword graph. graph[to, from] = float
+    beta : float
+        PageRank damping factor
+    max_iter : int
+        Maximum number of iterations
+    biases : numpy.ndarray
+        (n nodes, n biases) shape dense bias matrix. Each column is a bias vector.
+    verbose : Boolean
+        If True, it shows training progress.
+    sum_weight : float
+        Sum of weights of all nodes in graph
+    number_of_nodes : None or int
+        Number of nodes in graph
+    converge : float
+        Minimum rank difference between previous step and current step.
+        If the difference is smaller than converge, it do early-stop.
+    stop_rule : str
+        Early-stop rule. Choose one of ['l1', 'relative_l1', 'linf']. See `hits`
+    max_time : None or float
+        If it is not None, it stops all ranks after iteration which exceeds max_time seconds.
+    callback : None or callable
+        It is called after each iteration as callback(num_iter, num_active, elapsed).
+        num_active is the number of biases updated at the iteration.
+
+    Returns
+    -------
+    ranks : list of dict
+        Rank dictionary of each bias formed as {int:float}.
+        Only the nodes which have inbound edges are included, same with `hits`
+    """
+
+    if not number_of_nodes:
+        number_of_nodes = graph.shape[0]
+
+    _check_number_of_nodes(number_of_nodes)
+    threshold = _threshold(stop_rule, converge, sum_weight, number_of_nodes)
+
+    graph = csr_matrix(graph)
+    dw = sum_weight / number_of_nodes
+    biases = np.asarray(biases, dtype=np.float64)
+    if biases.ndim != 2 or biases.shape[0] != graph.shape[0]:
+        raise ValueError('biases must be (%d, n biases) shape, but %s' % (graph.shape[0], str(biases.shape)))
+    n_biases = biases.shape[1]
+
+    nodes = np.diff(graph.indptr) > 0
+    rank = np.where(nodes, dw, 0.0)[:, np.newaxis].repeat(n_biases, axis=1)
+    biases = (1 - beta) * np.where(nodes[:, np.newaxis], biases, 0.0)
+
+    # indices of biases which have not stopped yet
+    active = np.arange(n_biases)
+    begin_time = time.perf_counter()
+    for num_iter in range(1, max_iter + 1):
+        if active.shape[0] == 0:
+            break
+        rank_a = rank[:, active]
+        rank_ = beta * graph.dot(rank_a) + biases[:, active]
+        residuals = np.asarray([_residual(stop_rule, np.abs(rank_[:, j] - rank_a[:, j]), rank_[:, j])
+            for j in range(active.shape[0])])
+        rank[:, active] = rank_
+        num_active = active.shape[0]
+        active = active[~(residuals < threshold)]
+
+        elapsed = time.perf_counter() - begin_time
+        if callback is not None:
+            callback(num_iter, num_active, elapsed)
+        if verbose:
+            print('\riter = %d, %d / %d biases are updated' % (num_iter, num_active, n_biases), end='', flush=True)
+        if (max_time is not None) and (elapsed >= max_time):
+            break
+
+    if verbose:
+        print('\rdone')
+
+    node_indices = np.where(nodes)[0]
+    return [{int(node):float(rank[node, j]) for node in node_indices} for j in range(n_biases)]
+
+def _check_number_of_nodes(number_of_nodes):
+    if number_of_nodes <= 1:
+        raise ValueError(
+            'The graph should consist of at least two nodes\n',
+            'The node size of inserted graph is %d' % number_of_nodes
+        )
+
+def _threshold(stop_rule, converge, sum_weight, number_of_nodes):
+    if stop_rule == 'l1':
+        return sum_weight * converge
+    if stop_rule == 'relative_l1':
+        return converge
+    if stop_rule == 'linf':
+        return converge * sum_weight / number_of_nodes
+    raise ValueError('stop_rule must be one of %s, but %s' % (str(STOP_RULES), str(stop_rule)))
+
+def _residual(stop_rule, diff, rank):
+    if isinstance(diff, np.ndarray):
+        if stop_rule == 'l1':
+            return diff.sum()
+        if stop_rule == 'relative_l1':
+            return diff.sum() / max(np.abs(rank).sum(), 1e-15)
+        return diff.max() if diff.shape[0] > 0 else 0
+
+    if stop_rule == 'l1':
+        return sum(diff)
+    if stop_rule == 'relative_l1':
+        return sum(diff) / max(sum(abs(w) for w in rank), 1e-15)
+    return max(diff, default=0)
+
+def _is_stopped(num_iter, residual, threshold, begin_time, max_time, verbose, callback, history):
+    elapsed = time.perf_counter() - begin_time
+    history.append(Iteration(num_iter, float(residual), elapsed))
+    if callback is not None:
+        callback(num_iter, float(residual), elapsed)
+
+    if residual < threshold:
+        if verbose:
+            print('\riter = %d Early stopped.' % num_iter, end='', flush=True)
+        return True
+
+    if (max_time is not None) and (elapsed >= max_time):
+        if verbose:
+            print('\riter = %d Time limit exceeded.' % num_iter, end='', flush=True)
+        return True
+
+    if verbose:
+        print('\riter = %d' % num_iter, end='', flush=True)
+    return False
+
+def dict_to_csr(graph, number_of_nodes=None):
+    """
+    Arguments
+    ---------
+    graph : dict of dict
+        Adjacent subword graph. graph[int][int] = float
+    number_of_nodes : None or int
+        Number of nodes in graph.
+        If None, it uses (maximum node index + 1)
+
+    Returns
+    -------
+    graph : scipy.sparse.csr_matrix
+        (n nodes, n nodes) shape matrix. graph[i, j] = graph[i][j]
+    """
+    rows, cols, data = [], [], []
+    for i, j_dict in graph.items():
+        for j, w in j_dict.items():
+            rows.append(i)
+            cols.append(j)
+            data.append(w)
+    if number_of_nodes is None:
+        number_of_nodes = max(max(rows, default=-1), max(cols, default=-1)) + 1
+    return csr_matrix((data, (rows, cols)), shape=(number_of_nodes, number_of_nodes))
@@ -1,2 +1,3 @@
 from ._hangle import normalize
 from ._hangle import initialize_pattern
+from ._hangle import Normalizer
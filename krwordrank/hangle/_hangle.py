@@ -1,6 +1,11 @@
+from functools import lru_cache
 import re
 import sys
 
+from .._parallel import chunked
+from .._parallel import get_n_jobs
+from .._parallel import parallel_map
+
 
 korean_pattern_str = '가-힣'
 number_pattern_str = '0-9'
@@ -41,13 +46,13 @@ def normalize(doc, english=False, number=False, punctuation=False,
 
     if sys.version_info.major >= 3 and sys.version_info.minor <= 6:
         if not isinstance(pattern, re._pattern_type):
-            pattern = initialize_pattern(english, number, punctuation, remains)
+            pattern = _cached_pattern(english, number, punctuation, remains)
     elif sys.version_info.major >= 3 and sys.version_info.minor >= 7:
         if not isinstance(pattern, re.Pattern):
-            pattern = initialize_pattern(english, number, punctuation, remains)
+            pattern = _cached_pattern(english, number, punctuation, remains)
     else:
         if not isinstance(pattern, re.Pattern):
-            pattern = initialize_pattern(english, number, punctuation, remains)
+            pattern = _cached_pattern(english, number, punctuation, remains)
 
     if remove_repeat > 0:
         doc = repeatchars_pattern.sub('\\1' * remove_repeat, doc)
@@ -89,3 +94,140 @@ def initialize_pattern(english=False, number=False, punctuation=False, remains=N
     if isinstance(remains, str):
         pattern += remains
     return re.compile(r'[^%s]' % pattern)
+
+@lru_cache(maxsize=128)
+def _cached_pattern(english, number, punctuation, remains):
+    return initialize_pattern(english, number, punctuation, remains)
+
+
+class Normalizer:
+    """
+    Bulk version of `normalize`. It compiles the pattern once for its options,
+    and gives byte-identical output with `normalize` with same options.
+
+    The whitespace normalization is `' '.join(doc.split())`, which is same with
+    substituting `\\s+` and stripping, and the documents can be normalized
+    with multiple processes.
+
+        >>> from krwordrank.hangle import Normalizer
+
+        >>> normalizer = Normalizer(english=True, number=True)
+        >>> normalizer('어벤져스 4D 재밌다!!')
+        $ '어벤져스 4D 재밌다'
+
+        >>> texts = list(normalizer.normalize_docs(texts, n_jobs=4))
+        >>> normalizer.normalize_file('comments.txt', 'comments_norm.txt')
+
+    Arguments
+    ---------
+    english : Boolean
+        If True, it remains alphabet
+    number : Boolean
+        If True, it remains number
+    punctuation : Boolean
+        If True, it remains symbols '.,?!'
+    remove_repeat : int
+        If it is positive integer, it shortens repeated characters.
+    remains : None or str
+        User specfied characters that user wants to remain
+    pattern : None or re.Pattern
+        User specified regular expression pattern.
+        If it is None, pattern is built from the other options
+    """
+
+    def __init__(self, english=False, number=False, punctuation=False,
+        remove_repeat=0, remains=None, pattern=None):
+
+        self.remove_repeat = remove_repeat
+        if pattern is None:
+            pattern = _cached_pattern(english, number, punctuation, remains)
+        self.pattern = pattern
+
+    def __call__(self, doc):
+        return self.normalize(doc)
+
+    def normalize(self, doc):
+        """
+        Arguments
+        ---------
+        doc : str
+            Input string to be normalized
+
+        Returns
+        -------
+        doc : str
+            Normalized string
+        """
+        if self.remove_repeat > 0:
+            doc = repeatchars_pattern.sub('\\1' * self.remove_repeat, doc)
+        return ' '.join(self.pattern.sub(' ', doc).split())
+
+    def normalize_docs(self, docs, n_jobs=1, chunk_size=None):
+        """
+        Arguments
+        ---------
+        docs : iterable of str
+            List or iterator of documents
+        n_jobs : int
+            Number of processes. If it is negative, it uses (number of cores + 1 + n_jobs)
+            Default is 1
+        chunk_size : None or int
+            Number of documents sent to a process at once. See `krwordrank._parallel.chunked`
+
+        Yields
+        ------
+        doc : str
+            Normalized documents in the order of docs
+        """
+        n_jobs = get_n_jobs(n_jobs)
+        if n_jobs == 1:
+            for doc in docs:
+                yield self.normalize(doc)
+            return
+
+        chunks = chunked(docs, n_jobs, chunk_size)
+        for chunk in parallel_map(_normalize_chunk, chunks, n_jobs,
+            initializer=_initialize_worker, initargs=(self,)):
+            for doc in chunk:
+                yield doc
+
+    def normalize_file(self, input_path, output_path, n_jobs=1, encoding='utf-8', chunk_size=10000):
+        """
+        It normalizes a text file line by line, and streams the results into output file.
+        The file is not loaded into memory at once.
+
+        Arguments
+        ---------
+        input_path : str
+            Input file path. Each line is a document
+        output_path : str
+            Output file path
+        n_jobs : int
+            Number of processes. Default is 1
+        encoding : str
+            Encoding of both files. Default is 'utf-8'
+        chunk_size : int
+            Number of lines sent to a process at once. Default is 10000
+
+        Returns
+        -------
+        num_docs : int
+            Number of normalized lines
+        """
+        num_docs = 0
+        with open(input_path, encoding=encoding) as fi, open(output_path, 'w', encoding=encoding) as fo:
+            lines = (line.rstrip('\n') for line in fi)
+            for doc in self.normalize_docs(lines, n_jobs, chunk_size):
+                fo.write(doc + '\n')
+                num_docs += 1
+        return num_docs
+
+
+_worker_normalizer = None
+
+def _initialize_worker(normalizer):
+    global _worker_normalizer
+    _worker_normalizer = normalizer
+
+def _normalize_chunk(docs):
+    return [_worker_normalizer.normalize(doc) for doc in docs]
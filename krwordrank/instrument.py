@@ -0,0 +1,213 @@
+"""
+Instrumentation of KR-WordRank. Training and key-sentence selection report
+named timers and counters to an instrument.
+
+    >>> from krwordrank.instrument import Collector
+    >>> from krwordrank.word import KRWordRank
+
+    >>> collector = Collector()
+    >>> wordrank_extractor = KRWordRank(instrument=collector)
+    >>> keywords, rank, graph = wordrank_extractor.extract(texts)
+    >>> collector.report()
+    $ {'timers': {'scan_vocabs': 0.41, 'construct_word_graph': 1.02, ...},
+       'calls': {'scan_vocabs': 1, ...},
+       'counters': {'scan_vocabs.candidates': 153421, 'scan_vocabs.vocabs': 12940, ...}}
+
+Timers
+
+    scan_vocabs, construct_word_graph, hits, select_keywords, filter_compounds,
+    filter_subtokens, extract_keywords, tokenize, vectorize, select
+
+    When the number of keywords is given, extract_keywords replaces the three
+    keyword filters.
+
+Counters
+
+    scan_vocabs.candidates : number of subwords before min_count filtering
+    scan_vocabs.vocabs : number of subwords after min_count filtering
+    construct_word_graph.links : number of generated links
+    construct_word_graph.dropped_links : number of links which have out of vocabulary subword
+    construct_word_graph.edges : number of unique directed edges
+    hits.iterations : number of HITS iterations
+    hits.nodes : number of ranked subwords
+    select_keywords.keywords, filter_compounds.keywords, filter_subtokens.keywords :
+        number of keywords after each filter
+    extract_keywords.visited : number of L subwords visited by top-k keyword extraction
+    tokenize.eojeols : number of tokenized eojeols
+    vectorize.sentences, vectorize.nnz : shape of sentence-keyword matrix
+"""
+
+import logging
+import time
+
+
+class Instrument:
+    """
+    Base instrument. It ignores all reports, and it is the default instrument.
+    Subclasses set `enabled` True and override `record`.
+    """
+
+    enabled = False
+
+    def timer(self, name):
+        """
+        Context manager which reports elapsed seconds of the block.
+
+            >>> with instrument.timer('scan_vocabs'):
+            >>>     # do something
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def count(self, name, value=1):
+        """It reports counter value"""
+        if self.enabled:
+            self.record('counter', name, value)
+
+    def record(self, kind, name, value):
+        """
+        Arguments
+        ---------
+        kind : str
+            'timer' or 'counter'
+        name : str
+            Name of timer or counter
+        value : float or int
+            Elapsed seconds or count
+        """
+        pass
+
+
+class Collector(Instrument):
+    """
+    It accumulates the elapsed seconds and the number of calls of each timer,
+    and the sum of each counter.
+
+    Attributes
+    ----------
+    timers : dict
+        {str:float} Total elapsed seconds
+    calls : dict
+        {str:int} Number of timer calls
+    counters : dict
+        {str:int} Sum of counter values
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.timers = {}
+        self.calls = {}
+        self.counters = {}
+
+    def record(self, kind, name, value):
+        if kind == 'timer':
+            self.timers[name] = self.timers.get(name, 0) + value
+            self.calls[name] = self.calls.get(name, 0) + 1
+        else:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        """
+        Returns
+        -------
+        report : dict
+            {'timers': {str:float}, 'calls': {str:int}, 'counters': {str:int}}
+        """
+        return {'timers': dict(self.timers), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def reset(self):
+        self.timers = {}
+        self.calls = {}
+        self.counters = {}
+
+
+class LoggingInstrument(Instrument):
+    """
+    It logs every report.
+
+    Arguments
+    ---------
+    logger : None or logging.Logger
+        Default is logging.getLogger('krwordrank')
+    level : int
+        Logging level. Default is logging.INFO
+    """
+
+    enabled = True
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger if logger is not None else logging.getLogger('krwordrank')
+        self.level = level
+
+    def record(self, kind, name, value):
+        if kind == 'timer':
+            self.logger.log(self.level, '%s: %.4f sec', name, value)
+        else:
+            self.logger.log(self.level, '%s: %d', name, value)
+
+
+class CallbackInstrument(Instrument):
+    """
+    It calls callback(kind, name, value) for every report.
+    kind is 'timer' or 'counter'.
+    """
+
+    enabled = True
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, kind, name, value):
+        self.callback(kind, name, value)
+
+
+def get_instrument(instrument):
+    """
+    Arguments
+    ---------
+    instrument : None, Instrument or callable
+        If it is callable, it is wrapped with CallbackInstrument.
+
+    Returns
+    -------
+    instrument : Instrument
+    """
+    if instrument is None:
+        return NULL_INSTRUMENT
+    if isinstance(instrument, Instrument):
+        return instrument
+    if callable(instrument):
+        return CallbackInstrument(instrument)
+    raise TypeError('instrument must be None, Instrument or callable, but %s' % type(instrument))
+
+
+class _Timer:
+    __slots__ = ('instrument', 'name', 'begin')
+
+    def __init__(self, instrument, name):
+        self.instrument = instrument
+        self.name = name
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.instrument.record('timer', self.name, time.perf_counter() - self.begin)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+NULL_INSTRUMENT = Instrument()
@@ -0,0 +1,3 @@
+from ._pipeline import PipelineResult
+from ._pipeline import Stage
+from ._pipeline import SummarizationPipeline
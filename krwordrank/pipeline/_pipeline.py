@@ -0,0 +1,304 @@
+from array import array
+from collections import namedtuple
+import codecs
+from functools import partial
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from krwordrank.corpus import DocumentCorpus
+from krwordrank.corpus import parse_line
+from krwordrank.hangle import Normalizer
+from krwordrank.sentence import KeywordVectorizer
+from krwordrank.sentence import MaxScoreTokenizer
+from krwordrank.sentence import SentenceIndex
+from krwordrank.sentence import make_vocab_score
+from krwordrank.sentence._sentence import select
+from krwordrank.word import KRWordRank
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+Stage = namedtuple('Stage', 'name elapsed peak_memory')
+PipelineResult = namedtuple('PipelineResult', 'keywords sents raw_sents indices')
+
+
+class SummarizationPipeline:
+    """
+    It extracts keywords and key-sentences from a raw text file with bounded memory.
+    The file is processed in staged passes;
+
+        normalize : reads raw lines, records their byte offsets and writes
+                    normalized documents into a temporal file
+        train     : trains KRWordRank by streaming the normalized file
+        vectorize : streams the normalized file again into (n docs, n keywords) sparse matrix
+        select    : selects key-sentences, and re-reads only the selected lines using offsets
+
+    Neither raw texts nor normalized texts are held in memory. The result is same with
+    `summarize_with_sentences` applied to the list of normalized documents, except
+    the floating point rounding of keyword ranks when engine is 'csr'.
+
+        >>> from krwordrank.pipeline import SummarizationPipeline
+
+        >>> pipeline = SummarizationPipeline(num_keywords=100, num_keysents=10)
+        >>> result = pipeline.run('data/134963.txt', column=0)
+        >>> result.keywords
+        $ {'영화': 201.0, ...}
+        >>> result.sents
+        >>> pipeline.stages
+        $ [Stage(name='normalize', elapsed=0.52, peak_memory=...), ...]
+
+    Arguments
+    ---------
+    num_keywords : int
+        Number of keywords. Default is 100
+    num_keysents : int
+        Number of key-sentences. Default is 10
+    diversity : float
+        Minimum cosine distance between selected key-sentences. Default is 0.3
+    stopwords : None or set of str
+        Stopwords list for keyword and key-sentence extraction
+    scaling : None or callable
+        Keyword weight scaling function. Default is np.sqrt
+    penalty : None or callable
+        Penalty function of normalized sentence. str -> float
+    normalizer : None or callable
+        Function applied to each raw document. str -> str
+        Default is Normalizer(english=True, number=True)
+    min_count : int
+        Minimum frequency of subwords. Default is 5
+    max_length : int
+        Maximum length of subwords. Default is 10
+    beta : float
+        PageRank damping factor. Default is 0.85
+    max_iter : int
+        Maximum number of HITS iterations. Default is 10
+    num_rset : int
+        Number of R set words used to L-part word filtering. Default is -1
+    engine : str
+        Word graph engine of KRWordRank. Default is 'csr'
+    n_jobs : int
+        Number of processes used to train and to vectorize. Default is 1
+    max_candidates : None or int
+        If it is given, key-sentences are selected with `SentenceIndex`
+    memory : str or None
+        How peak memory of each stage is measured. Choose one of ['rss', 'tracemalloc', None]
+        'rss' is peak resident set size of the main process until the stage ends (bytes).
+        'tracemalloc' is peak of Python allocations during the stage (bytes), but it slows down.
+        Memory of worker processes is not included. Default is 'rss'
+    work_dir : None or str
+        Directory of temporal normalized file. Default is system temporal directory
+    verbose : Boolean
+        If True, it shows elapsed time of each stage
+
+    Attributes
+    ----------
+    stages : list of Stage
+        (name, elapsed seconds, peak memory bytes) of each stage of the last run
+    num_scored : int
+        Number of scored sentences in the last run. See `SentenceIndex`
+    is_exact : Boolean
+        True if key-sentences of the last run are guaranteed to be same with
+        the selection which scores all sentences
+    """
+
+    def __init__(self, num_keywords=100, num_keysents=10, diversity=0.3, stopwords=None,
+        scaling=None, penalty=None, normalizer=None, min_count=5, max_length=10, beta=0.85,
+        max_iter=10, num_rset=-1, engine='csr', n_jobs=1, max_candidates=None,
+        memory='rss', work_dir=None, verbose=False):
+
+        if memory not in {'rss', 'tracemalloc', None}:
+            raise ValueError("memory must be one of ['rss', 'tracemalloc', None], but %s" % str(memory))
+        if not 0 <= diversity <= 1:
+            raise ValueError('Diversity must be [0, 1] float value')
+
+        self.num_keywords = num_keywords
+        self.num_keysents = num_keysents
+        self.diversity = diversity
+        self.stopwords = stopwords if stopwords is not None else {}
+        self.scaling = scaling if scaling is not None else np.sqrt
+        self.penalty = penalty
+        self.normalizer = normalizer if normalizer is not None else Normalizer(english=True, number=True)
+        self.min_count = min_count
+        self.max_length = max_length
+        self.beta = beta
+        self.max_iter = max_iter
+        self.num_rset = num_rset
+        self.engine = engine
+        self.n_jobs = n_jobs
+        self.max_candidates = max_candidates
+        self.memory = memory
+        self.work_dir = work_dir
+        self.verbose = verbose
+        self.stages = []
+        self.num_scored = 0
+        self.is_exact = False
+
+    def run(self, path, column=None, delimiter='\t', encoding='utf-8'):
+        """
+        Arguments
+        ---------
+        path : str
+            Raw text file path. A line is a document
+        column : None or int
+            If it is not None, each line is splitted with delimiter and
+            only the column-th field is used as document. See `DocumentCorpus`
+        delimiter : str
+            Column delimiter. Default is '\\t'
+        encoding : str
+            File encoding. Default is 'utf-8'
+            Lines are found by newline byte before decoding, thus the encoding must
+            encode '\\n' as single newline byte, such as utf-8 or cp949. utf-16 and
+            utf-32 are not supported.
+
+        Returns
+        -------
+        result : PipelineResult
+            keywords : {str:float} keywords and their rank
+            sents : list of str, normalized key-sentences
+            raw_sents : list of str, raw lines of key-sentences
+            indices : list of int, line numbers of key-sentences
+        """
+        _check_line_encoding(encoding)
+        self.stages = []
+        started_tracemalloc = (self.memory == 'tracemalloc') and not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+
+        work_dir = tempfile.mkdtemp(prefix='krwordrank_', dir=self.work_dir)
+        normed_path = os.path.join(work_dir, 'normalized.txt')
+        parse = partial(parse_line, column=column, delimiter=delimiter)
+        try:
+            with self._stage('normalize'):
+                offsets = self._normalize(path, normed_path, parse, encoding)
+            corpus = DocumentCorpus(normed_path, encoding='utf-8')
+
+            with self._stage('train'):
+                keywords, vocab_score = self._train(corpus)
+
+            with self._stage('vectorize'):
+                x, initial_penalty, keyvec = self._vectorize(corpus, vocab_score)
+
+            with self._stage('select'):
+                idxs = self._select(x, keyvec, initial_penalty)
+                raw_sents = self._fetch(path, offsets, idxs, encoding)
+                sents = [self.normalizer(parse(raw)) for raw in raw_sents]
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+        keywords_ = {vocab:keywords[vocab] for vocab in vocab_score}
+        return PipelineResult(keywords_, sents, raw_sents, idxs)
+
+    def _normalize(self, path, normed_path, parse, encoding):
+        # byte offset of each line. The i-th normalized document comes from the i-th line
+        offsets = array('q')
+        offset = 0
+        with open(path, 'rb') as fi, open(normed_path, 'w', encoding='utf-8') as fo:
+            for line in fi:
+                offsets.append(offset)
+                offset += len(line)
+                doc = self.normalizer(parse(line.decode(encoding)))
+                # normalized document must be a line
+                fo.write(' '.join(doc.split()) + '\n')
+        return offsets
+
+    def _train(self, corpus):
+        wordrank_extractor = KRWordRank(
+            min_count = self.min_count,
+            max_length = self.max_length,
+            verbose = self.verbose,
+            n_jobs = self.n_jobs
+            )
+        num_keywords_ = self.num_keywords + len(self.stopwords)
+        keywords, _, _ = wordrank_extractor.extract(corpus, self.beta, self.max_iter,
+            num_keywords=num_keywords_, num_rset=self.num_rset, engine=self.engine)
+        vocab_score = make_vocab_score(keywords, self.stopwords,
+            scaling=self.scaling, topk=self.num_keywords)
+        return keywords, vocab_score
+
+    def _vectorize(self, corpus, vocab_score):
+        tokenizer = MaxScoreTokenizer(scores=vocab_score)
+        vectorizer = KeywordVectorizer(tokenizer.tokenize, vocab_score, self.n_jobs)
+        penalties = array('d')
+
+        def docs_with_penalty():
+            for doc in corpus:
+                penalties.append(0 if self.penalty is None else self.penalty(doc))
+                yield doc
+
+        x = vectorizer.vectorize(docs_with_penalty())
+        initial_penalty = np.frombuffer(penalties, dtype=np.float64) if penalties else np.zeros(0)
+        keyvec = vectorizer.keyword_vector.reshape(1,-1)
+        return x, initial_penalty, keyvec
+
+    def _select(self, x, keyvec, initial_penalty):
+        if self.max_candidates is not None:
+            index = SentenceIndex(x)
+            idxs = index.select(keyvec, initial_penalty, self.num_keysents,
+                self.diversity, self.max_candidates)
+            self.num_scored, self.is_exact = index.num_scored, index.is_exact
+        else:
+            idxs = select(x, keyvec, None, initial_penalty, self.num_keysents, self.diversity)
+            self.num_scored, self.is_exact = x.shape[0], True
+        return [int(idx) for idx in idxs]
+
+    def _fetch(self, path, offsets, idxs, encoding):
+        raws = []
+        with open(path, 'rb') as f:
+            for idx in idxs:
+                f.seek(offsets[idx])
+                raws.append(f.readline().decode(encoding).rstrip('\r\n'))
+        return raws
+
+    def _stage(self, name):
+        return _StageTimer(self, name)
+
+    def _peak_memory(self):
+        if self.memory == 'tracemalloc':
+            return tracemalloc.get_traced_memory()[1]
+        if self.memory == 'rss' and resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is bytes in macOS and kilobytes in Linux
+            return peak if sys.platform == 'darwin' else peak * 1024
+        return None
+
+
+class _StageTimer:
+    def __init__(self, pipeline, name):
+        self.pipeline = pipeline
+        self.name = name
+
+    def __enter__(self):
+        if self.pipeline.memory == 'tracemalloc':
+            tracemalloc.reset_peak()
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            return False
+        elapsed = time.perf_counter() - self.begin
+        stage = Stage(self.name, elapsed, self.pipeline._peak_memory())
+        self.pipeline.stages.append(stage)
+        if self.pipeline.verbose:
+            print('[%s] %.3f sec' % (self.name, elapsed))
+        return False
+
+def _check_line_encoding(encoding):
+    # lines of raw file are splitted on newline byte to keep their byte offsets.
+    # incremental encoder skips byte order mark, such as utf-8-sig
+    encoder = codecs.getincrementalencoder(encoding)()
+    encoder.encode('a')
+    newline = encoder.encode('\n')
+    if newline != b'\n':
+        raise ValueError('encoding must encode newline as single byte, '\
+            'but %s encodes it as %r' % (encoding, newline))
@@ -3,3 +3,4 @@ from ._sentence import KeywordVectorizer
 from ._sentence import keysentence
 from ._sentence import make_vocab_score
 from ._sentence import summarize_with_sentences
+from ._sentence import SentenceIndex
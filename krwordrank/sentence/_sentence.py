@@ -1,8 +1,16 @@
+from array import array
+import heapq
 import numpy as np
 from scipy.sparse import csr_matrix
+from scipy.sparse import vstack
 from sklearn.metrics import pairwise_distances
+from sklearn.preprocessing import normalize
 
 from ._tokenizer import MaxScoreTokenizer
+from .._parallel import chunked
+from .._parallel import get_n_jobs
+from .._parallel import parallel_map
+from ..instrument import get_instrument
 from ..word import KRWordRank
 
 
@@ -14,6 +22,10 @@ class KeywordVectorizer:
         Input format is str, output format is list of str (list of terms)
     vocab_score : dict
         {str:float} form keyword vector
+    n_jobs : int
+        Number of processes used to vectorize sentences.
+        If it is larger than 1, tokenize must be picklable, such as
+        `MaxScoreTokenizer.tokenize`. Default is 1
 
     Attributes
     ----------
@@ -27,12 +39,13 @@ class KeywordVectorizer:
         shape (len(idx_to_vocab),) vector
     """
 
-    def __init__(self, tokenize, vocab_score):
+    def __init__(self, tokenize, vocab_score, n_jobs=1):
         self.tokenize = tokenize
-        self.idx_to_vocab = [vocab for vocab in sorted(vocab_score, key=lambda x:-vocab_score[x])]
+        self.n_jobs = n_jobs
+        vocab_score = sorted(vocab_score.items(), key=lambda x:-x[1])
+        self.idx_to_vocab = [vocab for vocab, _ in vocab_score]
         self.vocab_to_idx = {vocab:idx for idx, vocab in enumerate(self.idx_to_vocab)}
-        self.keyword_vector = np.asarray(
-            [score for _, score in sorted(vocab_score.items(), key=lambda x:-x[1])])
+        self.keyword_vector = np.asarray([score for _, score in vocab_score])
         self.keyword_vector = self._L2_normalize(self.keyword_vector)
 
     def _L2_normalize(self, vectors):
@@ -50,23 +63,51 @@ class KeywordVectorizer:
         scipy.sparse.csr_matrix
             (n sents, n keywords) shape Boolean matrix
         """
-        rows, cols, data = [], [], []
-        for i, sent in enumerate(sents):
-            terms = set(self.tokenize(sent))
-            for term in terms:
-                j = self.vocab_to_idx.get(term, -1)
-                if j == -1:
-                    continue
-                rows.append(i)
-                cols.append(j)
-                data.append(1)
-        n_docs = len(sents)
+        n_jobs = get_n_jobs(self.n_jobs)
         n_terms = len(self.idx_to_vocab)
-        return csr_matrix((data, (rows, cols)), shape=(n_docs, n_terms))
+        if n_jobs == 1:
+            return _vectorize(sents, self.tokenize, self.vocab_to_idx, n_terms)
+
+        # each chunk is vectorized as CSR block, and the blocks are stacked in the order of chunks
+        initargs = (self.tokenize, self.vocab_to_idx, n_terms)
+        blocks = list(parallel_map(_vectorize_chunk, chunked(sents, n_jobs), n_jobs,
+            initializer=_initialize_worker, initargs=initargs))
+        if not blocks:
+            return _vectorize([], self.tokenize, self.vocab_to_idx, n_terms)
+        x = vstack(blocks, format='csr')
+        x.indptr = x.indptr.astype(blocks[0].indptr.dtype, copy=False)
+        x.indices = x.indices.astype(blocks[0].indices.dtype, copy=False)
+        return x
+
+
+def _vectorize(sents, tokenize, vocab_to_idx, n_terms):
+    # indices are written into flat buffer sentence by sentence, thus indptr is built directly
+    indices = array('i')
+    indptr = array('l', [0])
+    for sent in sents:
+        cols = {vocab_to_idx.get(term, -1) for term in tokenize(sent)}
+        cols.discard(-1)
+        indices.extend(sorted(cols))
+        indptr.append(len(indices))
+    indices = np.frombuffer(indices, dtype=np.int32) if indices else np.zeros(0, dtype=np.int32)
+    indptr = np.asarray(indptr, dtype=np.int32 if len(indices) < 2**31 else np.int64)
+    data = np.ones(indices.shape[0], dtype=np.int64)
+    return csr_matrix((data, indices, indptr), shape=(indptr.shape[0] - 1, n_terms))
+
+_worker_vectorizer = None
+
+def _initialize_worker(tokenize, vocab_to_idx, n_terms):
+    global _worker_vectorizer
+    _worker_vectorizer = (tokenize, vocab_to_idx, n_terms)
+
+def _vectorize_chunk(sents):
+    tokenize, vocab_to_idx, n_terms = _worker_vectorizer
+    return _vectorize(sents, tokenize, vocab_to_idx, n_terms)
 
 
 def summarize_with_sentences(texts, num_keywords=100, num_keysents=10, diversity=0.3, stopwords=None, scaling=None,
-    penalty=None, min_count=5, max_length=10, beta=0.85, max_iter=10, num_rset=-1, verbose=False, bias=None, return_indices=False):
+    penalty=None, min_count=5, max_length=10, beta=0.85, max_iter=10, num_rset=-1, verbose=False, bias=None, return_indices=False,
+    n_jobs=1, max_candidates=None, instrument=None):
     """
     It train KR-WordRank to extract keywords and selects key-sentences to summzriaze inserted texts.
 
@@ -121,6 +162,14 @@ def summarize_with_sentences(texts, num_keywords=100, num_keysents=10, diversity
     verbose : Boolean
         If True, it shows training status
         Default is False
+    n_jobs : int
+        Number of processes used to train KR-WordRank and to vectorize texts
+        Default is 1
+    max_candidates : None or int
+        If it is given, it scores only the sentences which contain the highest-weighted
+        keywords, at most about max_candidates sentences. See `SentenceIndex`
+    instrument : None, krwordrank.instrument.Instrument or callable
+        It receives timers and counters of all stages. See krwordrank.instrument
 
     Returns
     -------
@@ -138,7 +187,9 @@ def summarize_with_sentences(texts, num_keywords=100, num_keysents=10, diversity
     wordrank_extractor = KRWordRank(
         min_count = min_count,
         max_length = max_length,
-        verbose = verbose
+        verbose = verbose,
+        n_jobs = n_jobs,
+        instrument = instrument
         )
 
     num_keywords_ = num_keywords
@@ -154,19 +205,22 @@ def summarize_with_sentences(texts, num_keywords=100, num_keysents=10, diversity
     if stopwords is None:
         stopwords = {}
     vocab_score = make_vocab_score(keywords, stopwords, scaling=scaling, topk=num_keywords)
-    tokenizer = MaxScoreTokenizer(scores=vocab_score)
+    tokenizer = MaxScoreTokenizer(scores=vocab_score, instrument=instrument)
 
     # find key-sentences
     if return_indices is True:
-        sents, idxs = keysentence(vocab_score, texts, tokenizer.tokenize, num_keysents, diversity, penalty, return_indices=return_indices)
+        sents, idxs = keysentence(vocab_score, texts, tokenizer.tokenize, num_keysents, diversity, penalty, return_indices=return_indices,
+            max_candidates=max_candidates, n_jobs=n_jobs, instrument=instrument)
         keywords_ = {vocab:keywords[vocab] for vocab in vocab_score}
         return keywords_, sents, idxs
     else: 
-        sents = keysentence(vocab_score, texts, tokenizer.tokenize, num_keysents, diversity, penalty, return_indices=return_indices)
+        sents = keysentence(vocab_score, texts, tokenizer.tokenize, num_keysents, diversity, penalty, return_indices=return_indices,
+            max_candidates=max_candidates, n_jobs=n_jobs, instrument=instrument)
         keywords_ = {vocab:keywords[vocab] for vocab in vocab_score}
         return keywords_, sents
 
-def keysentence(vocab_score, texts, tokenize, topk=10, diversity=0.3, penalty=None, return_indices=False):
+def keysentence(vocab_score, texts, tokenize, topk=10, diversity=0.3, penalty=None, return_indices=False,
+    shortlist=None, max_candidates=None, n_jobs=1, instrument=None):
     """
     Arguments
     ---------
@@ -191,6 +245,19 @@ def keysentence(vocab_score, texts, tokenize, topk=10, diversity=0.3, penalty=No
 
             >>> penalty = lambda x: 0 if 25 <= len(x) <= 40 else 1
 
+    shortlist : None or int
+        Number of candidate sentences whose distances are updated. See `select`
+    max_candidates : None or int
+        If it is given, it scores only the sentences which contain the highest-weighted
+        keywords, at most about max_candidates sentences. See `SentenceIndex`
+    n_jobs : int
+        Number of processes used to vectorize texts. See `KeywordVectorizer`
+    instrument : None, krwordrank.instrument.Instrument or callable
+        It receives 'vectorize' and 'select' timers and
+        'vectorize.sentences', 'vectorize.nnz', 'select.scored' and 'select.exact' counters.
+        'select.scored' is the number of scored sentences, and 'select.exact' is 1
+        if the selection is guaranteed to be same with `select`, otherwise 0
+
     Returns
     -------
     keysentences : list of str
@@ -201,17 +268,31 @@ def keysentence(vocab_score, texts, tokenize, topk=10, diversity=0.3, penalty=No
     if not 0 <= diversity <= 1:
         raise ValueError('Diversity must be [0, 1] float value')
 
-    vectorizer = KeywordVectorizer(tokenize, vocab_score)
-    x = vectorizer.vectorize(texts)
+    instrument = get_instrument(instrument)
+    with instrument.timer('vectorize'):
+        vectorizer = KeywordVectorizer(tokenize, vocab_score, n_jobs)
+        x = vectorizer.vectorize(texts)
+    instrument.count('vectorize.sentences', x.shape[0])
+    instrument.count('vectorize.nnz', x.nnz)
+
     keyvec = vectorizer.keyword_vector.reshape(1,-1)
     initial_penalty = np.asarray([penalty(sent) for sent in texts])
-    idxs = select(x, keyvec, texts, initial_penalty, topk, diversity)
+    with instrument.timer('select'):
+        if max_candidates is not None:
+            index = SentenceIndex(x)
+            idxs = index.select(keyvec, initial_penalty, topk, diversity, max_candidates)
+            num_scored, is_exact = index.num_scored, index.is_exact
+        else:
+            idxs = select(x, keyvec, texts, initial_penalty, topk, diversity, shortlist)
+            num_scored, is_exact = x.shape[0], True
+    instrument.count('select.scored', num_scored)
+    instrument.count('select.exact', int(is_exact))
     if return_indices is True:
         return [texts[idx] for idx in idxs], idxs
     else : 
         return [texts[idx] for idx in idxs]
 
-def select(x, keyvec, texts, initial_penalty, topk=10, diversity=0.3):
+def select(x, keyvec, texts, initial_penalty, topk=10, diversity=0.3, shortlist=None):
     """
     Arguments
     ---------
@@ -229,6 +310,10 @@ def select(x, keyvec, texts, initial_penalty, topk=10, diversity=0.3):
         Minimum cosine distance between top ranked sentence and others.
         Large value makes this function select various sentence.
         The value must be [0, 1]
+    shortlist : None or int
+        If it is given, distances are updated only for the `shortlist` sentences
+        which are closest to keyword vector. The shortlist is doubled when
+        it cannot guarantee the closest sentence, thus the result is same.
 
     Returns
     -------
@@ -236,6 +321,224 @@ def select(x, keyvec, texts, initial_penalty, topk=10, diversity=0.3):
         The length of keysentences is topk at most.
     """
 
+    # cosine distance is computed same with sklearn.metrics.pairwise_distances
+    x = normalize(csr_matrix(x), copy=True)
+    keyvec = normalize(np.asarray(keyvec, dtype=np.float64).reshape(1, -1)).reshape(-1)
+    dist = _cosine_distance(x, keyvec)
+    dist = dist + initial_penalty
+
+    if (shortlist is not None) and (shortlist < x.shape[0]):
+        return _select_with_shortlist(x, dist, topk, diversity, shortlist)
+
+    idxs = []
+    for _ in range(topk):
+        idx = dist.argmin()
+        idxs.append(idx)
+        dist[idx] += 2 # maximum distance of cosine is 2
+        idx_all_distance = _cosine_distance(x, _dense_row(x, idx))
+        dist[idx_all_distance < diversity] += 2
+    return idxs
+
+def _select_with_shortlist(x, dist, topk, diversity, shortlist):
+    n_docs = x.shape[0]
+    # distances only increase, so the initial distance is lower bound of the others
+    order = np.argsort(dist, kind='stable')
+    size = shortlist
+    candidates = np.sort(order[:size])
+    candidate_x = x[candidates]
+    candidate_dist = dist[candidates]
+    bound = dist[order[size]] if size < n_docs else np.inf
+    idxs = []
+    selected_vectors = []
+
+    while len(idxs) < topk:
+        i = candidate_dist.argmin()
+        if candidate_dist[i] >= bound:
+            # expand shortlist and apply the penalties of selected sentences to new candidates
+            size = min(n_docs, size * 2)
+            new_candidates = np.setdiff1d(order[:size], candidates, assume_unique=True)
+            new_x = x[new_candidates]
+            new_dist = dist[new_candidates]
+            for vector in selected_vectors:
+                new_dist[_cosine_distance(new_x, vector) < diversity] += 2
+            candidates = np.concatenate([candidates, new_candidates])
+            candidate_dist = np.concatenate([candidate_dist, new_dist])
+            reorder = np.argsort(candidates, kind='stable')
+            candidates, candidate_dist = candidates[reorder], candidate_dist[reorder]
+            candidate_x = x[candidates]
+            bound = dist[order[size]] if size < n_docs else np.inf
+            continue
+
+        idx = candidates[i]
+        idxs.append(idx)
+        candidate_dist[i] += 2 # maximum distance of cosine is 2
+        vector = _dense_row(x, idx)
+        selected_vectors.append(vector)
+        candidate_dist[_cosine_distance(candidate_x, vector) < diversity] += 2
+    return idxs
+
+class SentenceIndex:
+    """
+    Inverted index from keyword to sentences for approximate key-sentence selection
+    over very large sentence pool. Instead of scoring all sentences, it scores only
+    the sentences which contain the highest-weighted keywords (MaxScore-style pruning).
+
+    A sentence which contains none of the processed keywords has cosine similarity
+    at most the L2 norm of the remaining keyword weights. If every selected sentence
+    is closer than this lower bound of unscored sentences, the result is exactly same
+    with `select`. Otherwise the result is approximation and `is_exact` is False.
+
+        >>> index = SentenceIndex(x)
+        >>> idxs = index.select(keyvec, initial_penalty, topk=10, max_candidates=100000)
+        >>> index.num_scored, index.is_exact
+
+    Arguments
+    ---------
+    x : scipy.sparse.csr_matrix
+        (n docs, n keywords) Boolean matrix
+
+    Attributes
+    ----------
+    num_scored : int
+        Number of scored sentences in the last selection
+    is_exact : Boolean
+        True if the last selection is guaranteed to be same with `select`
+    lower_bound : float
+        Lower bound of distance of unscored sentences in the last selection
+    """
+
+    def __init__(self, x):
+        self.x = csr_matrix(x)
+        self.postings = self.x.tocsc()
+        self.num_scored = 0
+        self.is_exact = False
+        self.lower_bound = np.inf
+
+    def select(self, keyvec, initial_penalty, topk=10, diversity=0.3, max_candidates=100000):
+        """
+        Arguments
+        ---------
+        keyvec : numpy.ndarray
+            (1, n keywords) rank vector
+        initial_penalty : numpy.ndarray
+            (n docs,) shape. Defined from penalty function
+        topk : int
+            Number of key sentences
+        diversity : float
+            Minimum cosine distance between top ranked sentence and others.
+            The value must be [0, 1]
+        max_candidates : int
+            Maximum number of scored sentences.
+
+        Returns
+        -------
+        keysentence indices : list of int
+        """
+        n_docs = self.x.shape[0]
+        initial_penalty = np.asarray(initial_penalty, dtype=np.float64)
+        if initial_penalty.ndim == 0:
+            initial_penalty = np.full(n_docs, float(initial_penalty))
+        weights = normalize(np.asarray(keyvec, dtype=np.float64).reshape(1, -1)).reshape(-1)
+        keywords = np.argsort(-weights, kind='stable')
+        num_terms = np.diff(self.x.indptr)
+
+        candidates = np.zeros(n_docs, dtype=bool)
+        num_candidates, i = 0, 0
+        target = min(max_candidates, max(10 * topk, 1))
+        while True:
+            # add posting lists of the highest-weighted keywords.
+            # i is the first keyword whose posting list is not added completely
+            while (i < keywords.shape[0]) and (weights[keywords[i]] > 0) and (num_candidates < target):
+                j = keywords[i]
+                docs = self.postings.indices[self.postings.indptr[j]:self.postings.indptr[j+1]]
+                docs = docs[~candidates[docs]]
+                if num_candidates + docs.shape[0] > max_candidates:
+                    # add only the promising part of the posting list
+                    bound = 1 - _similarity_upper_bound(weights[keywords[i:]], num_terms[docs])
+                    docs = docs[np.argsort(bound + initial_penalty[docs], kind='stable')]
+                    docs = docs[:max_candidates - num_candidates]
+                    candidates[docs] = True
+                    num_candidates += docs.shape[0]
+                    break
+                candidates[docs] = True
+                num_candidates += docs.shape[0]
+                i += 1
+
+            if num_candidates == n_docs:
+                lower_bound = np.inf
+            else:
+                # unscored sentences contain only keywords[i:]
+                unscored = ~candidates
+                upper_bound = _similarity_upper_bound(weights[keywords[i:]], num_terms[unscored])
+                lower_bound = (1 - upper_bound - 1e-12 + initial_penalty[unscored]).min()
+
+            candidate_idxs = np.where(candidates)[0]
+            idxs, exact = self._select(candidate_idxs, weights, initial_penalty,
+                topk, diversity, lower_bound)
+            self.num_scored, self.is_exact, self.lower_bound = num_candidates, exact, lower_bound
+            if exact or (num_candidates >= max_candidates) or (num_candidates == n_docs):
+                return idxs
+
+            if (i == keywords.shape[0]) or (weights[keywords[i]] <= 0):
+                # the other sentences may have no keyword. add them by their penalty
+                docs = np.where(~candidates)[0]
+                docs = docs[np.argsort(initial_penalty[docs], kind='stable')]
+                docs = docs[:max_candidates - num_candidates]
+                candidates[docs] = True
+                num_candidates += docs.shape[0]
+            target = min(max_candidates, target * 2)
+
+    def _select(self, candidates, weights, initial_penalty, topk, diversity, lower_bound):
+        if candidates.shape[0] == 0:
+            return [], topk <= 0
+        x = normalize(self.x[candidates], copy=True)
+        dist = _cosine_distance(x, weights) + initial_penalty[candidates]
+        idxs = []
+        exact = True
+        if candidates.shape[0] < self.x.shape[0]:
+            # `select` repeats sentences only after all sentences are selected
+            topk_ = min(topk, candidates.shape[0])
+        else:
+            topk_ = topk
+        for _ in range(topk_):
+            i = dist.argmin()
+            if dist[i] >= lower_bound:
+                exact = False
+            idxs.append(candidates[i])
+            dist[i] += 2 # maximum distance of cosine is 2
+            dist[_cosine_distance(x, _dense_row(x, i)) < diversity] += 2
+        if len(idxs) < topk:
+            exact = False
+        return idxs, exact
+
+def _similarity_upper_bound(weights, num_terms):
+    """
+    Cosine similarity between keyword vector and boolean sentence vector which has
+    num_terms keywords is at most (sum of num_terms largest weights) / sqrt(num_terms)
+    """
+    weights = np.sort(np.maximum(weights, 0))[::-1]
+    prefix = np.concatenate([[0], np.cumsum(weights)])
+    num_terms = np.minimum(num_terms, weights.shape[0])
+    bound = np.zeros(num_terms.shape[0])
+    nonzero = np.asarray(num_terms) > 0
+    bound[nonzero] = prefix[num_terms[nonzero]] / np.sqrt(num_terms[nonzero])
+    return bound
+
+def _cosine_distance(x, vector):
+    # x is row-normalized csr_matrix and vector is normalized dense vector
+    dist = x.dot(vector)
+    dist *= -1
+    dist += 1
+    return np.clip(dist, 0.0, 2.0)
+
+def _dense_row(x, idx):
+    vector = np.zeros(x.shape[1], dtype=x.dtype)
+    b, e = x.indptr[idx], x.indptr[idx+1]
+    vector[x.indices[b:e]] = x.data[b:e]
+    return vector
+
+def _select_pairwise(x, keyvec, texts, initial_penalty, topk=10, diversity=0.3):
+    # reference implementation of select using sklearn pairwise_distances
     dist = pairwise_distances(x, keyvec, metric='cosine').reshape(-1)
     dist = dist + initial_penalty
 
@@ -274,13 +577,15 @@ def make_vocab_score(keywords, stopwords, negatives=None, scaling=lambda x:x, to
     if negatives is None:
         negatives = {}
     keywords_ = {}
-    for word, rank in sorted(keywords.items(), key=lambda x:-x[1]):
+    # at most len(stopwords) candidates are skipped
+    candidates = heapq.nlargest(topk + len(stopwords), keywords.items(), key=lambda x:x[1])
+    for word, rank in candidates:
         if len(keywords_) >= topk:
             break
         if word in stopwords:
             continue
         if word in negatives:
-            keywords_[word] = negative[word]
+            keywords_[word] = negatives[word]
         else:
             keywords_[word] = scaling(rank)
     return keywords_
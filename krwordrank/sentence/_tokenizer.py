@@ -1,3 +1,12 @@
+from collections import namedtuple
+from collections import OrderedDict
+
+from ..instrument import get_instrument
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
 class MaxScoreTokenizer:
     """
     Transplanted from soynlp.tokenizer.MaxScoreTokenizer
@@ -5,22 +14,222 @@ class MaxScoreTokenizer:
     >>> word_score = {'term':0.8, ...}
     >>> tokenizer = MaxScoreTokenizer(word_score)
     >>> tokenizer.tokenize('Example sentence')
+
+    Arguments
+    ---------
+    scores : dict
+        {str:float} Word score
+    max_length : int
+        Maximum length of words
+    default_score : float
+        Score of subtokens which are not in scores
+    engine : str
+        Segmentation algorithm. Choose one of ['trie', 'sort']
+        'trie' finds scored subtokens with prefix trie, and fills the rest
+        of token in linear time. 'sort' sorts all subtokens (reference implementation).
+        Both give same tokens. Default is 'trie'
+    cache_size : int
+        Maximum number of tokens (eojeols) whose subtokens are memorized with LRU policy.
+        If it is 0, it does not use cache. Default is 100000
+    instrument : None, krwordrank.instrument.Instrument or callable
+        It receives 'tokenize' timer and 'tokenize.eojeols' counter
     """
 
-    def __init__(self, scores=None, max_length=10, default_score=0.0):
+    def __init__(self, scores=None, max_length=10, default_score=0.0, engine='trie', cache_size=100000,
+        instrument=None):
+        if engine not in {'trie', 'sort'}:
+            raise ValueError("engine must be 'trie' or 'sort', but %s" % str(engine))
         self._scores = scores if scores else {}
         self._max_length = max_length
         self._ds = default_score
+        self._engine = engine
+        self._trie = self._build_trie(self._scores, max_length)
+        self._cache_size = max(0, cache_size)
+        self._cache = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self.instrument = get_instrument(instrument)
+
+    def __getstate__(self):
+        # instrument may not be picklable, and worker processes do not report
+        state = self.__dict__.copy()
+        state['instrument'] = get_instrument(None)
+        return state
 
     def __call__(self, sentence, flatten=True):
         return self.tokenize(sentence, flatten)
 
     def tokenize(self, sentence, flatten=True):
-        tokens = [self._recursive_tokenize(token) for token in sentence.split()]
+        if self.instrument.enabled:
+            with self.instrument.timer('tokenize'):
+                tokens = [self._tokenize_token(token) for token in sentence.split()]
+            self.instrument.count('tokenize.eojeols', len(tokens))
+        else:
+            tokens = [self._tokenize_token(token) for token in sentence.split()]
         if flatten:
             tokens = [subtoken[0] for token in tokens for subtoken in token]
+        else:
+            tokens = [list(token) for token in tokens]
         return tokens
 
+    def _tokenize_token(self, token):
+        if self._cache_size == 0:
+            return self._segment(token)
+
+        subtokens = self._cache.get(token)
+        if subtokens is not None:
+            self._hits += 1
+            self._cache.move_to_end(token)
+            return subtokens
+
+        self._misses += 1
+        subtokens = tuple(self._segment(token))
+        self._cache[token] = subtokens
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return subtokens
+
+    def _segment(self, token):
+        if self._engine == 'trie':
+            return self._trie_tokenize(token)
+        return self._recursive_tokenize(token)
+
+    def cache_info(self):
+        """
+        Returns
+        -------
+        info : CacheInfo
+            namedtuple of (hits, misses, maxsize, currsize) like functools.lru_cache
+        """
+        return CacheInfo(self._hits, self._misses, self._cache_size, len(self._cache))
+
+    def cache_clear(self):
+        """It clears the cache and its statistics"""
+        self._cache.clear()
+        self._hits = 0
+        self._misses = 0
+
+    def prewarm(self, counter):
+        """
+        It tokenizes frequent tokens in advance. The most frequent tokens
+        are tokenized until the cache is full.
+
+            >>> wordrank_extractor = KRWordRank()
+            >>> counter = wordrank_extractor.scan_vocabs(texts)
+            >>> tokenizer.prewarm(counter)
+
+        Arguments
+        ---------
+        counter : dict
+            {str:int} token frequency, or {(subword, 'L' or 'R'):int} subword frequency
+            returned from `KRWordRank.scan_vocabs`. In the later, only L subwords are used.
+
+        Returns
+        -------
+        num_tokens : int
+            Number of tokenized tokens
+        """
+        tokens = {}
+        for key, freq in counter.items():
+            if isinstance(key, tuple):
+                if key[1] != 'L':
+                    continue
+                key = key[0]
+            tokens[key] = freq
+
+        # less frequent tokens come first, and they are evicted first
+        tokens = sorted(tokens, key=lambda token:-tokens[token])[:self._cache_size]
+        for token in reversed(tokens):
+            if token not in self._cache:
+                self._cache[token] = tuple(self._segment(token))
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return len(tokens)
+
+    def _build_trie(self, scores, max_length):
+        # the score of word is stored at the node of its last character with key ''
+        trie = {}
+        for word, score in scores.items():
+            if not (2 <= len(word) <= max_length):
+                continue
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = score
+        return trie
+
+    def _trie_tokenize(self, token):
+        length = len(token)
+        if length <= 2:
+            return [(token, 0, length, self._ds, length)]
+
+        range_l = min(self._max_length, length)
+        ds = self._ds
+
+        # scored subtokens found by trie. Subtokens whose score is larger than
+        # default score are selected first, and smaller ones are selected last
+        # with the order of (-score, -length, begin) like _find
+        highs, lows = [], []
+        for b in range(0, length - 1):
+            node = self._trie
+            for e in range(b + 1, min(b + range_l, length) + 1):
+                node = node.get(token[e-1])
+                if node is None:
+                    break
+                if (e - b < 2) or ('' not in node):
+                    continue
+                score = node['']
+                if score > ds:
+                    highs.append((-score, b - e, b, e))
+                elif score < ds:
+                    lows.append((-score, b - e, b, e))
+
+        result = []
+        occupied = bytearray(length)
+        if highs:
+            self._select_scored(token, highs, result, occupied)
+
+        # the other subtokens have default score, and they are selected with
+        # the order of (-length, begin). For each length, it scans empty ranges
+        # from the left, thus it costs O(length of token x range_l)
+        lows_ = {(b, e) for _, _, b, e in lows} if lows else ()
+        for r in range(range_l, 1, -1):
+            b = 0
+            while b + r <= length and len(result) <= 100:
+                e = b + r
+                if occupied[e-1]:
+                    b = e
+                elif occupied[b] or (b, e) in lows_ or (1 in occupied[b:e]):
+                    b += 1
+                else:
+                    result.append((token[b:e], b, e, ds, r))
+                    occupied[b:e] = b'\x01' * r
+                    b = e
+
+        if lows:
+            self._select_scored(token, lows, result, occupied)
+
+        result = sorted(result, key=lambda x:x[1])
+
+        adds = self._add_inter_subtokens(token, result)
+
+        if result[-1][2] != length:
+            adds += self._add_last_subtoken(token, result)
+
+        if result[0][1] != 0:
+            adds += self._add_first_subtoken(token, result)
+
+        return sorted(result + adds, key=lambda x:x[1])
+
+    def _select_scored(self, token, candidates, result, occupied):
+        for negative_score, _, b, e in sorted(candidates):
+            if len(result) > 100:
+                return
+            if 1 in occupied[b:e]:
+                continue
+            result.append((token[b:e], b, e, -negative_score, e - b))
+            occupied[b:e] = b'\x01' * (e - b)
+
     def _recursive_tokenize(self, token, range_l=0, debug=False):
 
         length = len(token)
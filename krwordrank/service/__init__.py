@@ -0,0 +1,2 @@
+from ._service import AsyncSummarizer
+from ._service import corpus_hash
@@ -0,0 +1,276 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import hashlib
+
+from krwordrank._parallel import get_n_jobs
+from krwordrank.sentence import summarize_with_sentences
+from krwordrank.word import summarize_with_keywords
+
+
+class AsyncSummarizer:
+    """
+    Asyncio facade of keyword and key-sentence extraction. Extraction runs in
+    an executor (process pool by default), thus it does not block event loop.
+
+    - Concurrent requests of same corpus are coalesced. They wait one job.
+    - At most `max_pending` jobs are submitted to executor at once. At most
+      `max_queue` other jobs wait for their turn in event loop. A request
+      which needs a new job is rejected with asyncio.QueueFull when the queue
+      is full (backpressure).
+    - If a request is cancelled or timed out, the job is cancelled only when
+      no other request waits for it. A job which already runs in a worker process
+      can not be stopped, and its result is discarded.
+
+        >>> from krwordrank.service import AsyncSummarizer
+
+        >>> summarizer = AsyncSummarizer(num_keywords=100, num_keysents=10, n_jobs=4)
+        >>> async def handler(texts):
+        >>>     keywords = await summarizer.keywords(texts, timeout=30)
+        >>>     keywords, sents = await summarizer.sentences(texts, timeout=30)
+        >>>     ...
+        >>> await summarizer.close()
+
+    Arguments
+    ---------
+    num_keywords : int
+        Number of keywords. Default is 100
+    num_keysents : int
+        Number of key-sentences. Default is 10
+    diversity : float
+        Minimum cosine distance between top ranked sentence and others.
+        Default is 0.3
+    stopwords : None or set of str
+        Stopwords list for keyword and key-sentence extraction
+    min_count : int
+        Minimum frequency of subwords used to construct subword graph
+        Default is 5
+    max_length : int
+        Maximum length of subwords used to construct subword graph
+        Default is 10
+    beta : float
+        PageRank damping factor. 0 < beta < 1
+        Default is 0.85
+    max_iter : int
+        Maximum number of iterations of HITS algorithm.
+        Default is 10
+    num_rset : int
+        Number of R set words sorted by rank. It will be used to L-part word filtering.
+        Default is -1.
+    n_jobs : int
+        Number of worker processes of default executor.
+        If it is negative, it uses (number of cores + 1 + n_jobs) processes.
+        Default is 1
+    max_pending : int
+        Maximum number of jobs submitted to executor at once.
+        Default is 2 * n_jobs
+    max_queue : int
+        Maximum number of jobs which wait for executor.
+        Default is 4 * max_pending
+    timeout : None or float
+        Default timeout seconds of each request
+    executor : None or concurrent.futures.Executor
+        If None, it creates ProcessPoolExecutor(n_jobs) at the first request and
+        shuts it down at `close`. User specified executor is not shut down.
+        For local test, ThreadPoolExecutor or stub executor is available.
+    """
+
+    def __init__(self, num_keywords=100, num_keysents=10, diversity=0.3, stopwords=None,
+        min_count=5, max_length=10, beta=0.85, max_iter=10, num_rset=-1,
+        n_jobs=1, max_pending=None, max_queue=None, timeout=None, executor=None):
+
+        self.params = {
+            'num_keywords': num_keywords,
+            'num_keysents': num_keysents,
+            'diversity': diversity,
+            'stopwords': stopwords,
+            'min_count': min_count,
+            'max_length': max_length,
+            'beta': beta,
+            'max_iter': max_iter,
+            'num_rset': num_rset
+        }
+        self.n_jobs = get_n_jobs(n_jobs)
+        self.max_pending = max_pending if max_pending is not None else 2 * self.n_jobs
+        if self.max_pending < 1:
+            raise ValueError('max_pending must be positive, but %s' % str(max_pending))
+        self.max_queue = max_queue if max_queue is not None else 4 * self.max_pending
+        if self.max_queue < 0:
+            raise ValueError('max_queue must be non-negative, but %s' % str(max_queue))
+        self.timeout = timeout
+        self._executor = executor
+        self._owns_executor = executor is None
+        # semaphore is bound to event loop, thus it is created at the first request
+        self._semaphore = None
+        self._jobs = {}
+
+    async def keywords(self, texts, timeout=None):
+        """
+        Arguments
+        ---------
+        texts : list of str
+            Sentence list
+        timeout : None or float
+            Timeout seconds. If None, it uses default timeout
+
+        Returns
+        -------
+        keywords : dict
+            {str:float} Same with `krwordrank.word.summarize_with_keywords`
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If it is not finished in timeout seconds
+        asyncio.QueueFull
+            If it needs a new job, but max_queue jobs already wait for executor
+        """
+        return await self._request('keywords', texts, timeout)
+
+    async def sentences(self, texts, timeout=None):
+        """
+        Arguments
+        ---------
+        texts : list of str
+            Sentence list
+        timeout : None or float
+            Timeout seconds. If None, it uses default timeout
+
+        Returns
+        -------
+        keywords : dict
+            {str:float} Keywords used to select key-sentences
+        sents : list of str
+            Key-sentences. Same with `krwordrank.sentence.summarize_with_sentences`
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If it is not finished in timeout seconds
+        asyncio.QueueFull
+            If it needs a new job, but max_queue jobs already wait for executor
+        """
+        return await self._request('sentences', texts, timeout)
+
+    @property
+    def num_jobs(self):
+        """Number of jobs which wait for executor or run in executor"""
+        return len(self._jobs)
+
+    async def close(self):
+        """It cancels waiting jobs and shuts down the default executor"""
+        for job in list(self._jobs.values()):
+            job.task.cancel()
+        self._jobs = {}
+        if self._owns_executor and self._executor is not None:
+            executor, self._executor = self._executor, None
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, partial(executor.shutdown, True))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _request(self, kind, texts, timeout):
+        texts = list(texts)
+        if timeout is None:
+            timeout = self.timeout
+
+        key = (kind, corpus_hash(texts))
+        job = self._jobs.get(key)
+        if job is None:
+            # at most max_pending jobs hold the semaphore, and the others wait for it
+            if len(self._jobs) >= self.max_pending + self.max_queue:
+                raise asyncio.QueueFull('%d jobs already wait for executor (max_queue=%d)'
+                    % (len(self._jobs) - self.max_pending, self.max_queue))
+            job = _Job(asyncio.ensure_future(self._run(kind, texts)))
+            self._jobs[key] = job
+            job.task.add_done_callback(partial(self._remove_job, key, job))
+
+        job.waiters += 1
+        try:
+            # shield keeps the shared job from the cancellation of each request
+            return await asyncio.wait_for(asyncio.shield(job.task), timeout)
+        finally:
+            job.waiters -= 1
+            if job.waiters == 0 and not job.task.done():
+                # remove the job now, otherwise an identical request may join the cancelled job
+                # before the done callback is called
+                if self._jobs.get(key) is job:
+                    del self._jobs[key]
+                job.task.cancel()
+
+    async def _run(self, kind, texts):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        async with self._semaphore:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._get_executor(), _FUNCTIONS[kind], texts, self.params)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.n_jobs)
+        return self._executor
+
+    def _remove_job(self, key, job, task):
+        if self._jobs.get(key) is job:
+            del self._jobs[key]
+        # retrieve exception of the job which has no waiter to avoid warning
+        if not task.cancelled():
+            task.exception()
+
+
+class _Job:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+def corpus_hash(texts):
+    """
+    Arguments
+    ---------
+    texts : list of str
+        Sentence list
+
+    Returns
+    -------
+    hash : str
+        SHA-1 hex digest of texts. The order of texts matters.
+    """
+    sha1 = hashlib.sha1()
+    for text in texts:
+        sha1.update(text.encode('utf-8'))
+        # separator which can not appear in utf-8 encoded str
+        sha1.update(b'\xff')
+    return sha1.hexdigest()
+
+def _keywords(texts, params):
+    return summarize_with_keywords(texts,
+        num_keywords = params['num_keywords'],
+        stopwords = params['stopwords'],
+        min_count = params['min_count'],
+        max_length = params['max_length'],
+        beta = params['beta'],
+        max_iter = params['max_iter'],
+        num_rset = params['num_rset']
+        )
+
+def _sentences(texts, params):
+    return summarize_with_sentences(texts,
+        num_keywords = params['num_keywords'],
+        num_keysents = params['num_keysents'],
+        diversity = params['diversity'],
+        stopwords = params['stopwords'],
+        min_count = params['min_count'],
+        max_length = params['max_length'],
+        beta = params['beta'],
+        max_iter = params['max_iter'],
+        num_rset = params['num_rset']
+        )
+
+_FUNCTIONS = {'keywords': _keywords, 'sentences': _sentences}
@@ -1,2 +1,5 @@
 from ._word import summarize_with_keywords
 from ._word import KRWordRank
+from ._word import SweepResult
+from ._vocab import Vocabulary
+from ._batch import summarize_with_keywords_batch
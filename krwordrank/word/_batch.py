@@ -0,0 +1,118 @@
+from multiprocessing import Pool
+
+from krwordrank._parallel import get_n_jobs
+from ._word import KRWordRank
+from ._word import _summarize_with_keywords
+
+
+def summarize_with_keywords_batch(corpora, num_keywords=100, stopwords=None, min_count=5,
+    max_length=10, beta=0.85, max_iter=10, num_rset=-1, n_jobs=-1,
+    large_corpus_size=50000, pack_size=10000):
+    """
+    It extracts keywords from many independent corpora with one shared process pool.
+    The result of each corpus is same with `summarize_with_keywords`.
+
+    Small corpora are packed together until the number of their documents
+    reaches `pack_size`, and each pack is trained in a worker process.
+    A corpus larger than `large_corpus_size` is trained in the main process,
+    and its subword scanning and graph construction are split across the pool.
+
+        >>> from krwordrank.word import summarize_with_keywords_batch
+
+        >>> corpora = {'movie_1': texts_1, 'movie_2': texts_2, ...}
+        >>> keywords = summarize_with_keywords_batch(corpora, num_keywords=100)
+        >>> keywords['movie_1']
+        $ {'영화': 201.0, ...}
+
+    Arguments
+    ---------
+    corpora : dict
+        {id: list of str}
+    num_keywords : int
+        Number of keywords extracted from KR-WordRank
+        Default is 100.
+    stopwords : None or set of str
+        Stopwords list for keyword and key-sentence extraction
+    min_count : int
+        Minimum frequency of subwords used to construct subword graph
+        Default is 5
+    max_length : int
+        Maximum length of subwords used to construct subword graph
+        Default is 10
+    beta : float
+        PageRank damping factor. 0 < beta < 1
+        Default is 0.85
+    max_iter : int
+        Maximum number of iterations of HITS algorithm.
+        Default is 10
+    num_rset : int
+        Number of R set words sorted by rank. It will be used to L-part word filtering.
+        Default is -1.
+    n_jobs : int
+        Number of worker processes.
+        If it is negative, it uses (number of cores + 1 + n_jobs) processes.
+        Default is -1
+    large_corpus_size : int
+        Minimum number of documents of a corpus to be split across the pool
+        Default is 50000
+    pack_size : int
+        Maximum number of documents of packed small corpora
+        Default is 10000
+
+    Returns
+    -------
+    keywords : dict
+        {id: {str:float}}
+    """
+    params = (num_keywords, stopwords, min_count, max_length, beta, max_iter, num_rset)
+    n_jobs = get_n_jobs(n_jobs)
+
+    larges = [(key, texts) for key, texts in corpora.items() if len(texts) >= large_corpus_size]
+    packs = _pack([(key, texts) for key, texts in corpora.items()
+        if len(texts) < large_corpus_size], pack_size)
+
+    results = {}
+    if n_jobs == 1:
+        for pack in packs:
+            results.update(_summarize_pack((pack, params)))
+        for key, texts in larges:
+            results[key] = _summarize(texts, params, n_jobs=1)
+        return {key:results[key] for key in corpora}
+
+    with Pool(n_jobs) as pool:
+        # small corpora are queued first, and the chunks of large corpora follow them
+        pending = pool.imap_unordered(_summarize_pack, [(pack, params) for pack in packs])
+        for key, texts in larges:
+            results[key] = _summarize(texts, params, n_jobs=n_jobs, pool=pool)
+        for result in pending:
+            results.update(result)
+
+    return {key:results[key] for key in corpora}
+
+def _pack(corpora, pack_size):
+    packs = []
+    pack, size = [], 0
+    for key, texts in sorted(corpora, key=lambda x:-len(x[1])):
+        if pack and (size + len(texts) > pack_size):
+            packs.append(pack)
+            pack, size = [], 0
+        pack.append((key, texts))
+        size += len(texts)
+    if pack:
+        packs.append(pack)
+    return packs
+
+def _summarize(texts, params, n_jobs=1, pool=None):
+    num_keywords, stopwords, min_count, max_length, beta, max_iter, num_rset = params
+    wordrank_extractor = KRWordRank(
+        min_count = min_count,
+        max_length = max_length,
+        n_jobs = n_jobs
+        )
+    wordrank_extractor._pool = pool
+    return _summarize_with_keywords(wordrank_extractor, texts,
+        num_keywords, stopwords, beta, max_iter, num_rset)
+
+def _summarize_pack(args):
+    pack, params = args
+    return [(key, _summarize(texts, params)) for key, texts in pack]
@@ -0,0 +1,290 @@
+from array import array
+import numpy as np
+
+from ._vocab import Vocabulary
+
+
+class CorpusStatistics:
+    """
+    Sufficient statistics of KR-WordRank training. Subword counts and
+    subword graph depend only on the frequency of each token (eojeol) and
+    the frequency of each adjacent token pair, thus the statistics can be
+    counted once and reused for several configurations (see `KRWordRank.sweep`).
+
+    Attributes
+    ----------
+    tokens : dict
+        {str:int} Token frequency. The keys are ordered by their first appearance.
+    rsub_pairs : dict
+        {(str, str):int} Frequency of (left token, current token) pairs.
+        It generates links from R subwords of left token to current token.
+    lsub_pairs : dict
+        {(str, str):int} Frequency of (current token, right token) pairs.
+        It generates links from current token to L subwords of right token.
+    """
+
+    def __init__(self):
+        self.tokens = {}
+        self.rsub_pairs = {}
+        self.lsub_pairs = {}
+
+    def add(self, docs):
+        """
+        Arguments
+        ---------
+        docs : iterable of str
+            Documents to be added
+        """
+        _count_tokens(docs, 1, self.tokens, self.rsub_pairs, self.lsub_pairs)
+
+    def count_subwords(self, max_length):
+        """
+        It gives same counter with scanning all added documents.
+
+        Arguments
+        ---------
+        max_length : int
+            Maximum length of subwords
+
+        Returns
+        -------
+        counter : dict
+            {(subword, 'L' or 'R'): frequency}
+        """
+        counter = {}
+        for token, freq in self.tokens.items():
+            len_token = len(token)
+            counter[(token, 'L')] = counter.get((token, 'L'), 0) + freq
+
+            for e in range(1, min(len_token, max_length)):
+                if (len_token - e) > max_length:
+                    continue
+
+                l_sub = (token[:e], 'L')
+                r_sub = (token[e:], 'R')
+                counter[l_sub] = counter.get(l_sub, 0) + freq
+                counter[r_sub] = counter.get(r_sub, 0) + freq
+        return counter
+
+
+class SubwordStatistics:
+    """
+    Subword counts and link counts of fitted documents, used by `KRWordRank.partial_fit`.
+    Appended and removed documents are applied as +/- deltas of the tables, thus
+    subwords and links are generated only from the unique tokens and adjacent token
+    pairs of the delta documents. Vocabulary and subword graph are selected from
+    the tables with vectorized operations.
+
+    A link is stored as undirected key, min(id) * 2^32 + max(id), of subword ids.
+    The tables keep the links of all subwords, including infrequent ones, because
+    they can be frequent after more documents are appended.
+    When more than half of subword ids are dead, that is they have no count and
+    no link, the tables are compacted and link keys are re-mapped to new ids.
+
+    Attributes
+    ----------
+    subwords : Vocabulary
+        All subwords which have appeared in subword counts or links. Its index is subword id.
+    counts : numpy.ndarray
+        (n subwords,) int64 subword frequency
+    order : numpy.ndarray
+        (n subwords,) int64 order of first appearance in subword counts. -1 if it has not been counted.
+        It breaks ties of frequency like `KRWordRank.scan_vocabs`
+    link_keys : numpy.ndarray
+        Sorted unique undirected link keys
+    link_counts : numpy.ndarray
+        int64 frequency of each link key
+    num_docs : int
+        Number of documents
+    """
+
+    def __init__(self):
+        self.subwords = Vocabulary()
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.link_keys = np.zeros(0, dtype=np.int64)
+        self.link_counts = np.zeros(0, dtype=np.int64)
+        self.num_docs = 0
+        self._num_ordered = 0
+
+    def update(self, extractor, docs, expired_docs=None):
+        """
+        Arguments
+        ---------
+        extractor : KRWordRank
+            It generates links, and its max_length is used to count subwords
+        docs : iterable of str
+            Appended documents
+        expired_docs : None or iterable of str
+            Removed documents. They should be added before.
+        """
+        tokens, rsub_pairs, lsub_pairs = {}, {}, {}
+        self.num_docs += _count_tokens(docs, 1, tokens, rsub_pairs, lsub_pairs)
+        if expired_docs is not None:
+            self.num_docs -= _count_tokens(expired_docs, -1, tokens, rsub_pairs, lsub_pairs)
+        self._update_counts(tokens, extractor.max_length)
+        self._update_links(extractor, tokens, rsub_pairs, lsub_pairs)
+        if expired_docs is not None:
+            self._compact()
+
+    def _update_counts(self, tokens, max_length):
+        # same with CorpusStatistics.count_subwords
+        append = self.subwords.append
+        delta = {}
+        for token, freq in tokens.items():
+            if freq == 0:
+                continue
+            len_token = len(token)
+            idx = append(token, 'L')
+            delta[idx] = delta.get(idx, 0) + freq
+            for e in range(1, min(len_token, max_length)):
+                if (len_token - e) > max_length:
+                    continue
+                for idx in (append(token[:e], 'L'), append(token[e:], 'R')):
+                    delta[idx] = delta.get(idx, 0) + freq
+        self._resize()
+
+        # keys of delta are ordered by their first appearance in documents
+        ids = np.fromiter(delta.keys(), dtype=np.int64, count=len(delta))
+        self.counts[ids] += np.fromiter(delta.values(), dtype=np.int64, count=len(delta))
+        news = ids[(self.order[ids] < 0) & (self.counts[ids] > 0)]
+        self.order[news] = np.arange(self._num_ordered, self._num_ordered + news.shape[0])
+        self._num_ordered += news.shape[0]
+
+    def _update_links(self, extractor, tokens, rsub_pairs, lsub_pairs):
+        append = self.subwords.append
+        keys, freqs = array('q'), array('q')
+
+        def add(links, freq):
+            for (l_sub, l_side), (r_sub, r_side) in links:
+                a = append(l_sub, l_side)
+                b = append(r_sub, r_side)
+                keys.append((a << 32) | b if a <= b else (b << 32) | a)
+                freqs.append(freq)
+
+        for token, freq in tokens.items():
+            if freq != 0:
+                add(extractor._intra_link(token), freq)
+        for (t_left, t_curr), freq in rsub_pairs.items():
+            if freq != 0:
+                add(extractor._rsub_to_token(t_left, t_curr), freq)
+        for (t_curr, t_rigt), freq in lsub_pairs.items():
+            if freq != 0:
+                add(extractor._token_to_lsub(t_curr, t_rigt), freq)
+        self._resize()
+
+        keys, freqs = _reduce_keys(np.asarray(keys, dtype=np.int64), np.asarray(freqs, dtype=np.int64))
+        positions = np.searchsorted(self.link_keys, keys)
+        found = positions < self.link_keys.shape[0]
+        found[found] = self.link_keys[positions[found]] == keys[found]
+        self.link_counts[positions[found]] += freqs[found]
+        self.link_keys = np.insert(self.link_keys, positions[~found], keys[~found])
+        self.link_counts = np.insert(self.link_counts, positions[~found], freqs[~found])
+        if (freqs < 0).any():
+            remains = self.link_counts != 0
+            self.link_keys = self.link_keys[remains]
+            self.link_counts = self.link_counts[remains]
+
+    def _compact(self):
+        n_subwords = self.counts.shape[0]
+        alive = self.counts != 0
+        if 2 * alive.sum() >= n_subwords:
+            return
+        alive[self.link_keys >> 32] = True
+        alive[self.link_keys & 0xffffffff] = True
+        if 2 * alive.sum() >= n_subwords:
+            return
+
+        ids = np.flatnonzero(alive)
+        decode = self.subwords.decode
+        self.subwords = Vocabulary.from_tokens(decode(idx) for idx in ids.tolist())
+        self.counts = self.counts[ids]
+        self.order = self.order[ids]
+        # ids are re-mapped in the same order, thus link keys remain sorted
+        index = np.cumsum(alive) - 1
+        self.link_keys = (index[self.link_keys >> 32] << 32) | index[self.link_keys & 0xffffffff]
+
+    def _resize(self):
+        n_news = len(self.subwords) - self.counts.shape[0]
+        if n_news > 0:
+            self.counts = np.concatenate([self.counts, np.zeros(n_news, dtype=np.int64)])
+            self.order = np.concatenate([self.order, np.full(n_news, -1, dtype=np.int64)])
+
+    def vocabulary(self, min_count):
+        """
+        Arguments
+        ---------
+        min_count : int
+            Minimum frequency of subwords
+
+        Returns
+        -------
+        vocabulary : Vocabulary
+            Subwords sorted by frequency like `KRWordRank.scan_vocabs`
+        ids : numpy.ndarray
+            Subword id of each index of vocabulary
+        """
+        ids = np.flatnonzero((self.counts >= min_count) & (self.counts > 0))
+        ids = ids[np.lexsort((self.order[ids], -self.counts[ids]))]
+        decode = self.subwords.decode
+        vocabulary = Vocabulary.from_tokens(decode(idx) for idx in ids.tolist())
+        return vocabulary, ids
+
+    def encoded_links(self, ids):
+        """
+        Arguments
+        ---------
+        ids : numpy.ndarray
+            Subword id of each index of vocabulary
+
+        Returns
+        -------
+        l_nodes : numpy.ndarray
+            Vocabulary index of one side of links
+        r_nodes : numpy.ndarray
+            Vocabulary index of the other side of links
+        counts : numpy.ndarray
+            Link frequency
+        """
+        index = np.full(len(self.subwords), -1, dtype=np.int64)
+        index[ids] = np.arange(ids.shape[0])
+        l_nodes = index[self.link_keys >> 32]
+        r_nodes = index[self.link_keys & 0xffffffff]
+        encoded = (l_nodes >= 0) & (r_nodes >= 0)
+        return l_nodes[encoded], r_nodes[encoded], self.link_counts[encoded]
+
+
+def _count_tokens(docs, delta, tokens, rsub_pairs, lsub_pairs):
+    # same with padding of KRWordRank._link_encoder. zero and negative frequency are kept
+    num_docs = 0
+    for doc in docs:
+        num_docs += 1
+        doc_tokens = doc.split()
+        for token in doc_tokens:
+            tokens[token] = tokens.get(token, 0) + delta
+
+        if len(doc_tokens) <= 1:
+            continue
+
+        doc_tokens = [doc_tokens[-1]] + doc_tokens + [doc_tokens[0]]
+        for i in range(1, len(doc_tokens) - 1):
+            pair = (doc_tokens[i-1], doc_tokens[i])
+            rsub_pairs[pair] = rsub_pairs.get(pair, 0) + delta
+            pair = (doc_tokens[i], doc_tokens[i+1])
+            lsub_pairs[pair] = lsub_pairs.get(pair, 0) + delta
+    return num_docs
+
+def _reduce_keys(keys, counts):
+    """
+    Returns
+    -------
+    block : tuple of numpy.ndarray
+        (sorted unique keys, sum of counts of each key)
+    """
+    order = np.argsort(keys, kind='stable')
+    keys, counts = keys[order], counts[order]
+    del order
+    if keys.shape[0] == 0:
+        return keys, counts
+    begins = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    return keys[begins], np.add.reduceat(counts, begins)
@@ -0,0 +1,241 @@
+import json
+import os
+from collections.abc import Mapping
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from krwordrank.about import __version__
+from krwordrank.graph import dict_to_csr
+from ._vocab import SIDES
+from ._vocab import _IndexView
+
+
+FORMAT_VERSION = 1
+
+
+def save_model(extractor, path):
+    """
+    It saves a trained KRWordRank into directory `path` as flat numpy arrays.
+
+        strings.npy       : uint8, utf-8 encoded subwords concatenated in index order
+        offsets.npy       : int64, (n vocabs + 1,) offsets of each subword in strings
+        sides.npy         : uint8, (n vocabs,) 0 is L and 1 is R
+        lorder.npy        : int32, indices of L subwords sorted by subword
+        rorder.npy        : int32, indices of R subwords sorted by subword
+        rank.npy          : float32, (n vocabs,) rank of subwords. NaN if it is not ranked
+        graph_indptr.npy  : int64, CSR graph indptr
+        graph_indices.npy : int32, CSR graph indices
+        graph_data.npy    : float32, CSR graph data
+        meta.json         : parameters of KRWordRank
+
+    Arguments
+    ---------
+    extractor : KRWordRank
+        Trained KR-WordRank
+    path : str
+        Directory path
+    """
+    os.makedirs(path, exist_ok=True)
+    vocabulary = extractor.vocabulary
+    n_vocabs = len(vocabulary)
+    subwords = [vocabulary.decode(idx) for idx in range(n_vocabs)]
+
+    encoded = [subword.encode('utf-8') for subword, _ in subwords]
+    offsets = np.zeros(n_vocabs + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+    strings = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    sides = np.asarray([SIDES.index(side) for _, side in subwords], dtype=np.uint8)
+    lorder = sorted((idx for idx in range(n_vocabs) if sides[idx] == 0), key=lambda idx:encoded[idx])
+    rorder = sorted((idx for idx in range(n_vocabs) if sides[idx] == 1), key=lambda idx:encoded[idx])
+
+    rank = np.full(n_vocabs, np.nan, dtype=np.float32)
+    for idx, r in extractor.rank.items():
+        rank[idx] = r
+
+    graph = extractor.graph
+    if graph is None:
+        graph = csr_matrix((n_vocabs, n_vocabs), dtype=np.float32)
+    elif isinstance(graph, dict):
+        graph = dict_to_csr(graph, n_vocabs)
+    graph = csr_matrix(graph)
+
+    arrays = {
+        'strings': strings,
+        'offsets': offsets,
+        'sides': sides,
+        'lorder': np.asarray(lorder, dtype=np.int32),
+        'rorder': np.asarray(rorder, dtype=np.int32),
+        'rank': rank,
+        'graph_indptr': graph.indptr.astype(np.int64),
+        'graph_indices': graph.indices.astype(np.int32),
+        'graph_data': graph.data.astype(np.float32)
+    }
+    for name, values in arrays.items():
+        np.save(os.path.join(path, name + '.npy'), values)
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'krwordrank_version': __version__,
+        'min_count': extractor.min_count,
+        'max_length': extractor.max_length,
+        'sum_weight': extractor.sum_weight,
+        'n_vocabs': n_vocabs
+    }
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+def load_model(cls, path, mmap=True):
+    """
+    Arguments
+    ---------
+    cls : class
+        KRWordRank
+    path : str
+        Directory path saved by `save_model`
+    mmap : Boolean
+        If True, arrays are opened with numpy.memmap (read-only), and
+        the processes which load same model share the pages.
+
+    Returns
+    -------
+    extractor : KRWordRank
+        Its vocabulary is MappedVocabulary, rank is MappedRank and
+        graph is (n vocabs, n vocabs) shape scipy.sparse.csr_matrix
+    """
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta['format_version'] != FORMAT_VERSION:
+        raise ValueError('Unsupported model format version %s' % str(meta['format_version']))
+
+    mmap_mode = 'r' if mmap else None
+    def load(name):
+        return np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+
+    n_vocabs = meta['n_vocabs']
+    extractor = cls(min_count=meta['min_count'], max_length=meta['max_length'])
+    extractor.vocabulary = MappedVocabulary(load('strings'), load('offsets'),
+        load('sides'), load('lorder'), load('rorder'))
+    extractor.index2vocab = extractor.vocabulary.index2vocab
+    extractor.sum_weight = meta['sum_weight']
+    extractor.rank = MappedRank(load('rank'))
+    extractor.graph = csr_matrix(
+        (load('graph_data'), load('graph_indices'), load('graph_indptr')),
+        shape=(n_vocabs, n_vocabs), copy=False)
+    return extractor
+
+
+class MappedVocabulary(Mapping):
+    """
+    Read-only vocabulary on flat arrays saved by `save_model`.
+    It has same interface with Vocabulary. Subword lookup is
+    binary search over subwords sorted for each side.
+    """
+
+    __slots__ = ('strings', 'offsets', 'sides', 'orders')
+
+    def __init__(self, strings, offsets, sides, lorder, rorder):
+        self.strings = strings
+        self.offsets = offsets
+        self.sides = sides
+        self.orders = (lorder, rorder)
+
+    def _encoded(self, index):
+        return self.strings[self.offsets[index]:self.offsets[index+1]].tobytes()
+
+    def index(self, subword, side):
+        """
+        Returns
+        -------
+        index : int
+            Index of (subword, side). If it is unknown, it returns -1
+        """
+        if side == 'L':
+            order = self.orders[0]
+        elif side == 'R':
+            order = self.orders[1]
+        else:
+            return -1
+        target = subword.encode('utf-8')
+        begin, end = 0, order.shape[0]
+        while begin < end:
+            mid = (begin + end) // 2
+            if self._encoded(order[mid]) < target:
+                begin = mid + 1
+            else:
+                end = mid
+        if begin < order.shape[0] and self._encoded(order[begin]) == target:
+            return int(order[begin])
+        return -1
+
+    def decode(self, index):
+        """
+        Returns
+        -------
+        token : tuple
+            (subword, 'L') or (subword, 'R')
+        """
+        return (self._encoded(index).decode('utf-8'), SIDES[self.sides[index]])
+
+    @property
+    def index2vocab(self):
+        """Read-only list-like view of (subword, side) ordered by index"""
+        return _IndexView(self)
+
+    def __getitem__(self, token):
+        try:
+            subword, side = token
+        except (TypeError, ValueError):
+            raise KeyError(token)
+        index = self.index(subword, side)
+        if index < 0:
+            raise KeyError(token)
+        return index
+
+    def __contains__(self, token):
+        try:
+            subword, side = token
+        except (TypeError, ValueError):
+            return False
+        return self.index(subword, side) >= 0
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.decode(index)
+
+    def __len__(self):
+        return self.sides.shape[0]
+
+    def __repr__(self):
+        return 'MappedVocabulary(%d subwords)' % len(self)
+
+
+class MappedRank(Mapping):
+    """
+    Read-only {int:float} rank on dense array. NaN means unranked subword.
+
+    Attributes
+    ----------
+    array : numpy.ndarray
+        (n vocabs,) float32 rank
+    """
+
+    __slots__ = ('array',)
+
+    def __init__(self, array):
+        self.array = array
+
+    def __getitem__(self, index):
+        if not (0 <= index < self.array.shape[0]) or np.isnan(self.array[index]):
+            raise KeyError(index)
+        return float(self.array[index])
+
+    def __iter__(self):
+        for index in np.where(~np.isnan(self.array))[0]:
+            yield int(index)
+
+    def items(self):
+        ranked = np.where(~np.isnan(self.array))[0]
+        return zip(ranked.tolist(), self.array[ranked].tolist())
+
+    def __len__(self):
+        return int((~np.isnan(self.array)).sum())
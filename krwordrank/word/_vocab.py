@@ -0,0 +1,167 @@
+from array import array
+from collections.abc import Mapping
+from collections.abc import Sequence
+
+
+SIDES = ('L', 'R')
+
+
+class Vocabulary(Mapping):
+    """
+    Compact subword vocabulary. It works as read-only dict {(subword, side):index},
+    but it does not keep (subword, side) tuples. Subwords are stored in
+    separate L and R string-to-index tables, and the side of each index
+    is stored in a byte array.
+
+        >>> vocabulary = Vocabulary.from_tokens([('영화', 'L'), ('는', 'R')])
+        >>> vocabulary[('영화', 'L')]
+        $ 0
+        >>> vocabulary.index('는', 'R')
+        $ 1
+        >>> vocabulary.decode(1)
+        $ ('는', 'R')
+
+    Attributes
+    ----------
+    lvocab : dict
+        {str:int} L subword to index mapper
+    rvocab : dict
+        {str:int} R subword to index mapper
+    subwords : list of str
+        Subword of each index
+    sides : array.array
+        Side of each index. 0 is L and 1 is R
+    """
+
+    __slots__ = ('lvocab', 'rvocab', 'subwords', 'sides')
+
+    def __init__(self):
+        self.lvocab = {}
+        self.rvocab = {}
+        self.subwords = []
+        self.sides = array('b')
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        """
+        Arguments
+        ---------
+        tokens : iterable of tuple
+            (subword, 'L') or (subword, 'R'). Index is given by its order
+
+        Returns
+        -------
+        vocabulary : Vocabulary
+        """
+        vocabulary = cls()
+        for subword, side in tokens:
+            vocabulary.append(subword, side)
+        return vocabulary
+
+    @classmethod
+    def from_dict(cls, vocabulary):
+        """
+        Arguments
+        ---------
+        vocabulary : dict
+            {(subword, side):index} formed vocabulary
+
+        Returns
+        -------
+        vocabulary : Vocabulary
+        """
+        if isinstance(vocabulary, cls):
+            return vocabulary
+        return cls.from_tokens(token for token, _ in sorted(vocabulary.items(), key=lambda x:x[1]))
+
+    def append(self, subword, side):
+        """
+        It adds a new subword at the end of vocabulary and returns its index.
+        If the subword already exists, it returns existing index.
+        """
+        table = self._table(side)
+        index = table.get(subword, -1)
+        if index >= 0:
+            return index
+        index = len(self.subwords)
+        table[subword] = index
+        self.subwords.append(subword)
+        self.sides.append(0 if side == 'L' else 1)
+        return index
+
+    def _table(self, side):
+        if side == 'L':
+            return self.lvocab
+        if side == 'R':
+            return self.rvocab
+        raise ValueError("side must be 'L' or 'R', but %s" % str(side))
+
+    def index(self, subword, side):
+        """
+        Returns
+        -------
+        index : int
+            Index of (subword, side). If it is unknown, it returns -1
+        """
+        if side == 'L':
+            return self.lvocab.get(subword, -1)
+        if side == 'R':
+            return self.rvocab.get(subword, -1)
+        return -1
+
+    def decode(self, index):
+        """
+        Returns
+        -------
+        token : tuple
+            (subword, 'L') or (subword, 'R')
+        """
+        return (self.subwords[index], SIDES[self.sides[index]])
+
+    @property
+    def index2vocab(self):
+        """Read-only list-like view of (subword, side) ordered by index"""
+        return _IndexView(self)
+
+    def __getitem__(self, token):
+        try:
+            subword, side = token
+        except (TypeError, ValueError):
+            raise KeyError(token)
+        index = self.index(subword, side)
+        if index < 0:
+            raise KeyError(token)
+        return index
+
+    def __contains__(self, token):
+        try:
+            subword, side = token
+        except (TypeError, ValueError):
+            return False
+        return self.index(subword, side) >= 0
+
+    def __iter__(self):
+        for index in range(len(self.subwords)):
+            yield self.decode(index)
+
+    def __len__(self):
+        return len(self.subwords)
+
+    def __repr__(self):
+        return 'Vocabulary(%d subwords)' % len(self)
+
+
+class _IndexView(Sequence):
+
+    __slots__ = ('_vocabulary',)
+
+    def __init__(self, vocabulary):
+        self._vocabulary = vocabulary
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._vocabulary.decode(i) for i in range(*index.indices(len(self)))]
+        return self._vocabulary.decode(index)
+
+    def __len__(self):
+        return len(self._vocabulary)
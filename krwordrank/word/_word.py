@@ -1,12 +1,38 @@
+from array import array
 from collections import defaultdict
+from collections import namedtuple
+from functools import partial
+import heapq
 import math
+import time
 import numpy as np
+from scipy.sparse import csr_matrix
 
+from krwordrank._parallel import chunked
+from krwordrank._parallel import get_n_jobs
+from krwordrank._parallel import parallel_map
+from krwordrank.corpus import as_reiterable
+from krwordrank.graph import dict_to_csr
 from krwordrank.graph import hits
-
+from krwordrank.graph import hits_batch
+from krwordrank.graph import hits_csr
+from krwordrank.graph._rank import _check_number_of_nodes
+from krwordrank.graph._rank import _threshold
+from krwordrank.instrument import get_instrument
+from ._statistics import CorpusStatistics
+from ._statistics import SubwordStatistics
+from ._statistics import _reduce_keys
+from ._storage import MappedRank
+from ._storage import load_model
+from ._storage import save_model
+from ._vocab import Vocabulary
+
+
+SweepResult = namedtuple('SweepResult',
+    'min_count max_length beta max_iter num_rset keywords elapsed score'.split())
 
 def summarize_with_keywords(texts, num_keywords=100, stopwords=None, min_count=5,
-    max_length=10, beta=0.85, max_iter=10, num_rset=-1, verbose=False):
+    max_length=10, beta=0.85, max_iter=10, num_rset=-1, verbose=False, n_jobs=1):
     """
     It train KR-WordRank to extract keywords from texts.
 
@@ -42,6 +68,9 @@ def summarize_with_keywords(texts, num_keywords=100, stopwords=None, min_count=5
     verbose : Boolean
         If True, it shows training status
         Default is False
+    n_jobs : int
+        Number of processes used to train KR-WordRank
+        Default is 1
 
     Returns
     -------
@@ -59,20 +88,29 @@ def summarize_with_keywords(texts, num_keywords=100, stopwords=None, min_count=5
     wordrank_extractor = KRWordRank(
         min_count = min_count,
         max_length = max_length,
-        verbose = verbose
+        verbose = verbose,
+        n_jobs = n_jobs
         )
 
-    keywords, rank, graph = wordrank_extractor.extract(texts,
-        beta, max_iter, num_rset=num_rset)
+    return _summarize_with_keywords(wordrank_extractor, texts,
+        num_keywords, stopwords, beta, max_iter, num_rset)
 
-    # stopword filtering
+def _summarize_with_keywords(wordrank_extractor, texts, num_keywords, stopwords, beta, max_iter, num_rset):
     if stopwords is None:
         stopwords = {}
+
+    # at most len(stopwords) keywords are removed by stopword filtering.
+    # extracted keywords are sorted by rank
+    num_candidates = num_keywords + len(stopwords) if num_keywords > 0 else -1
+    keywords, rank, graph = wordrank_extractor.extract(texts,
+        beta, max_iter, num_keywords=num_candidates, num_rset=num_rset)
+
+    # stopword filtering
     keywords = {word:r for word, r in keywords.items() if not (word in stopwords)}
 
     # top rank filtering
     if num_keywords > 0:
-        keywords = {word:r for word, r in sorted(keywords.items(), key=lambda x:-x[1])[:num_keywords]}
+        keywords = dict(heapq.nlargest(num_keywords, keywords.items(), key=lambda x:x[1]))
 
     return keywords
 
@@ -95,6 +133,26 @@ class KRWordRank:
     verbose : Boolean
         If True, it shows training status
         Default is False
+    n_jobs : int
+        Number of processes used to scan subwords and to construct subword graph.
+        If it is negative, it uses (number of cores + 1 + n_jobs) processes.
+        Default is 1
+    callback : None or callable
+        Progress callback for long jobs. It is called as callback(stage, num_docs)
+        for every callback_interval documents and at the end of each stage.
+        stage is 'scan_vocabs' or 'construct_graph'
+    callback_interval : int
+        Number of documents between callback calls
+        Default is 10000
+    instrument : None, krwordrank.instrument.Instrument or callable
+        It receives timers and counters of training stages. See krwordrank.instrument
+        If it is callable, it is called as instrument(kind, name, value)
+        Default is None (no instrumentation)
+    memo_size : int
+        Maximum number of tokens whose subword indices are memorized while
+        constructing subword graph. The memo is cleared when it is full.
+        Large memo is faster for large vocabulary, but uses more memory.
+        Default is 10000
 
     Usage
     -----
@@ -104,13 +162,33 @@ class KRWordRank:
         >>> wordrank_extractor = KRWordRank()
         >>> keywords, rank, graph = wordrank_extractor.extract(texts, beta, max_iter, verbose)
     """
-    def __init__(self, min_count=5, max_length=10, verbose=False):
+    def __init__(self, min_count=5, max_length=10, verbose=False, n_jobs=1,
+        callback=None, callback_interval=10000, instrument=None, memo_size=10000):
+
         self.min_count = min_count
         self.max_length = max_length
         self.verbose = verbose
+        self.n_jobs = get_n_jobs(n_jobs)
+        self.callback = callback
+        self.callback_interval = callback_interval
+        self.memo_size = memo_size
+        self.instrument = get_instrument(instrument)
         self.sum_weight = 1
-        self.vocabulary = {}
-        self.index2vocab = []
+        self.vocabulary = Vocabulary()
+        self.index2vocab = self.vocabulary.index2vocab
+        self.rank = {}
+        self.graph = None
+        self._statistics = None
+        # shared multiprocessing pool. see summarize_with_keywords_batch
+        self._pool = None
+
+    def __getstate__(self):
+        # process pool, callback and instrument may not be picklable, and worker processes do not use them
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        state['callback'] = None
+        state['instrument'] = get_instrument(None)
+        return state
 
     def scan_vocabs(self, docs):
         """
@@ -119,58 +197,56 @@ class KRWordRank:
 
         Arguments
         ---------
-        docs : list of str
-            Sentence list
+        docs : list of str, str or re-iterable object
+            Sentence list. File path or generator factory is also available.
+            See krwordrank.corpus.as_reiterable
 
         Returns
         -------
         counter : dict
             {(subword, 'L')] : frequency}
+
+        Subwords are indexed in descending order of frequency. Subwords which have
+        same frequency are ordered by their first appearance in docs, thus
+        the parallel scanning (n_jobs > 1) gives same indices with the serial one.
         """
-        self.vocabulary = {}
         if self.verbose:
             print('scan vocabs ... ')
 
-        counter = {}
-        for doc in docs:
-
-            for token in doc.split():
-                len_token = len(token)
-                counter[(token, 'L')] = counter.get((token, 'L'), 0) + 1
-
-                for e in range(1, min(len(token), self.max_length)):
-                    if (len_token - e) > self.max_length:
-                        continue
-
-                    l_sub = (token[:e], 'L')
-                    r_sub = (token[e:], 'R')
-                    counter[l_sub] = counter.get(l_sub, 0) + 1
-                    counter[r_sub] = counter.get(r_sub, 0) + 1
+        docs = self._progress(as_reiterable(docs), 'scan_vocabs')
+        with self.instrument.timer('scan_vocabs'):
+            if self.n_jobs == 1:
+                counter = _count_subwords(docs, self.max_length)
+            else:
+                # merge partial counters in the order of chunks to keep the first-seen order of subwords
+                counter = {}
+                count = partial(_count_subwords, max_length=self.max_length)
+                for partial_counter in parallel_map(count, chunked(docs, self.n_jobs), self.n_jobs, pool=self._pool):
+                    for token, freq in partial_counter.items():
+                        counter[token] = counter.get(token, 0) + freq
 
-        counter = {token:freq for token, freq in counter.items() if freq >= self.min_count}
-        for token, _ in sorted(counter.items(), key=lambda x:x[1], reverse=True):
-            self.vocabulary[token] = len(self.vocabulary)
-
-        self._build_index2vocab()
+            counter = self._vocabulary_from_counter(counter)
 
         if self.verbose:
             print('num vocabs = %d' % len(counter))
         return counter
 
     def _build_index2vocab(self):
-        self.index2vocab = [vocab for vocab, index in sorted(self.vocabulary.items(), key=lambda x:x[1])]
+        self.vocabulary = Vocabulary.from_dict(self.vocabulary)
+        self.index2vocab = self.vocabulary.index2vocab
         self.sum_weight = len(self.index2vocab)
     
     def extract(self, docs, beta=0.85, max_iter=10, num_keywords=-1,
-        num_rset=-1, vocabulary=None, bias=None, rset=None):
+        num_rset=-1, vocabulary=None, bias=None, rset=None, engine='dict'):
         """
         It constructs word graph and trains ranks of each node using HITS algorithm.
         After training it selects suitable subwords as words.
 
         Arguments
         ---------
-        docs : list of str
-            Sentence list.
+        docs : list of str, str or re-iterable object
+            Sentence list. File path or generator factory is also available.
+            See krwordrank.corpus.as_reiterable
         beta : float
             PageRank damping factor. 0 < beta < 1
             Default is 0.85
@@ -183,12 +259,15 @@ class KRWordRank:
         num_rset : int
             Number of R set words sorted by rank. It will be used to L-part word filtering.
             Default is -1.
-        vocabulary : None or dict
-            User specified vocabulary to index mapper
+        vocabulary : None, dict or Vocabulary
+            User specified vocabulary to index mapper. {(subword, side):int}
         bias : None or dict
             User specified HITS bias term
         rset : None or dict
             User specfied R set
+        engine : str
+            HITS implementation. Choose one of ['dict', 'csr']
+            Default is 'dict'
 
         Returns
         -------
@@ -196,8 +275,9 @@ class KRWordRank:
             word : rank dictionary. {str:float}
         rank : dict
             subword : rank dictionary. {int:float}
-        graph : dict of dict
+        graph : dict of dict or scipy.sparse.csr_matrix
             Adjacent subword graph. {int:{int:float}}
+            If engine is 'csr', it is (n vocabs, n vocabs) shape sparse matrix
 
         Usage
         -----
@@ -208,26 +288,219 @@ class KRWordRank:
             >>> keywords, rank, graph = wordrank_extractor.extract(texts, beta, max_iter, verbose)
         """
 
-        rank, graph = self.train(docs, beta, max_iter, vocabulary, bias)
+        rank, graph = self.train(docs, beta, max_iter, vocabulary, bias, engine)
+
+        keywords = self._extract_keywords(rank, num_keywords, num_rset, rset)
+        return keywords, rank, graph
+
+    def extract_keywords(self, num_keywords=-1, num_rset=-1, rset=None):
+        """
+        It selects keywords from the rank of trained (or loaded) KR-WordRank
+        without re-training.
+
+        Arguments
+        ---------
+        num_keywords : int
+            Number of keywords sorted by rank.
+            Default is -1. If the vaule is negative, it returns all extracted words.
+        num_rset : int
+            Number of R set words sorted by rank. It will be used to L-part word filtering.
+            Default is -1.
+        rset : None or dict
+            User specfied R set
 
-        lset = {self.int2token(idx)[0]:r for idx, r in rank.items() if self.int2token(idx)[1] == 'L'}
+        Returns
+        -------
+        keywords : dict
+            word : rank dictionary. {str:float}
+        """
+        return self._extract_keywords(self.rank, num_keywords, num_rset, rset)
+
+    def save(self, path):
+        """
+        It saves vocabulary, rank and graph as flat numpy arrays in directory `path`.
+        The saved model can be opened with numpy.memmap using `KRWordRank.load`.
+
+        Arguments
+        ---------
+        path : str
+            Directory path
+        """
+        save_model(self, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Arguments
+        ---------
+        path : str
+            Directory path saved by `KRWordRank.save`
+        mmap : Boolean
+            If True, arrays are memory-mapped (read-only) and shared among processes.
+            Default is True
+
+        Returns
+        -------
+        wordrank_extractor : KRWordRank
+            Its rank is stored as float32, and graph is scipy.sparse.csr_matrix.
+
+        Usage
+        -----
+            >>> wordrank_extractor.save('lalaland_model/')
+            >>> wordrank_extractor = KRWordRank.load('lalaland_model/')
+            >>> keywords = wordrank_extractor.extract_keywords(num_keywords=100)
+        """
+        return load_model(cls, path, mmap)
+
+    def _extract_keywords(self, rank, num_keywords=-1, num_rset=-1, rset=None):
+        # top-k path visits subwords one by one. When most of subwords are visited anyway,
+        # filtering all subwords is faster
+        if 0 < 32 * num_keywords < len(rank):
+            with self.instrument.timer('extract_keywords'):
+                return self._extract_topk_keywords(rank, num_keywords, num_rset, rset)
+
+        lset, rset_ = self._split_rank(rank)
         if not rset:
-            rset = {self.int2token(idx)[0]:r for idx, r in rank.items() if self.int2token(idx)[1] == 'R'}
+            rset = rset_
 
         if num_rset > 0:
-            rset = {token:r for token, r in sorted(rset.items(), key=lambda x:-x[1])[:num_rset]}
-
-        keywords = self._select_keywords(lset, rset)
-        keywords = self._filter_compounds(keywords)
-        keywords = self._filter_subtokens(keywords)
+            rset = dict(heapq.nlargest(num_rset, rset.items(), key=lambda x:x[1]))
+
+        # the output of each filter is ordered by rank, thus lset is sorted only once
+        instrument = self.instrument
+        with instrument.timer('select_keywords'):
+            keywords = self._select_keywords(lset, rset)
+        instrument.count('select_keywords.keywords', len(keywords))
+        with instrument.timer('filter_compounds'):
+            keywords = self._filter_compounds(keywords, is_sorted=True)
+        instrument.count('filter_compounds.keywords', len(keywords))
+        with instrument.timer('filter_subtokens'):
+            keywords = self._filter_subtokens(keywords, is_sorted=True)
+        instrument.count('filter_subtokens.keywords', len(keywords))
 
         if num_keywords > 0:
-            keywords = {token:r for token, r in sorted(keywords.items(), key=lambda x:-x[1])[:num_keywords]}
+            keywords = dict(heapq.nlargest(num_keywords, keywords.items(), key=lambda x:x[1]))
 
-        return keywords, rank, graph
+        return keywords
+
+    def _extract_topk_keywords(self, rank, num_keywords, num_rset, rset):
+        """
+        It gives same keywords with applying the three filters to all L subwords
+        and then selecting top num_keywords, but it visits L subwords in the order
+        of rank only until num_keywords keywords are found.
+
+        The visiting order is built from rank array by partial selection. It takes
+        the L subwords whose rank is larger than or equal to the k-th largest one,
+        and k grows when they are not enough. The filters depend on higher ranked
+        subwords, except for the compound filter which checks whether both parts
+        are selected keywords. Such parts are checked on demand by `is_selected`,
+        which depends only on higher ranked prefixes.
+        """
+        vocabulary = self.vocabulary
+        idxs, values = _rank_arrays(rank)
+        sides = np.asarray(vocabulary.sides, dtype=np.int64)[idxs]
+        # order of ties is the order of rank dict, same with the stable sort of full filtering
+        position = np.full(len(vocabulary), -1, dtype=np.int64)
+        position[idxs] = np.arange(idxs.shape[0])
+
+        if not rset:
+            rpos = np.flatnonzero(sides == 1)
+            if num_rset > 0:
+                rpos = rpos[_ranked_order(values[rpos], num_rset)[:num_rset]]
+            rset = {vocabulary.decode(idx)[0] for idx in idxs[rpos].tolist()}
+        elif num_rset > 0:
+            rset = dict(heapq.nlargest(num_rset, rset.items(), key=lambda x:x[1]))
+
+        def lookup(word):
+            # (-rank, position) of L subword, or None if it is not ranked
+            idx = vocabulary.index(word, 'L')
+            if idx < 0 or position[idx] < 0:
+                return None
+            pos = int(position[idx])
+            return (-values[pos], pos)
+
+        memo = {}
+        def is_selected(word, key):
+            # same with `word in self._select_keywords(lset, rset)`
+            selected = memo.get(word)
+            if selected is not None:
+                return selected
+            selected = len(word) > 1
+            for e in range(2, len(word)):
+                prefix = word[:e]
+                if prefix not in rset:
+                    continue
+                prefix_key = lookup(prefix)
+                if (prefix_key is not None) and (prefix_key < key) and is_selected(prefix, prefix_key):
+                    selected = False
+                    break
+            memo[word] = selected
+            return selected
+
+        def is_keyword(word):
+            key = lookup(word)
+            return (key is not None) and is_selected(word, key)
+
+        keywords = {}
+        compounds_ = set()
+        prefixes = set()
+        lpos = np.flatnonzero(sides == 0)
+        lvalues = values[lpos]
+        k = min(lpos.shape[0], max(1024, 8 * num_keywords))
+        num_visited = 0
+        while len(keywords) < num_keywords and num_visited < lpos.shape[0]:
+            order = _ranked_order(lvalues, k)
+            for j in order[num_visited:].tolist():
+                pos = int(lpos[j])
+                word = vocabulary.decode(int(idxs[pos]))[0]
+                num_visited += 1
+                if not is_selected(word, (-values[pos], pos)):
+                    continue
+
+                # same with _filter_compounds
+                len_word = len(word)
+                if len_word == 3 and word[:2] in compounds_:
+                    continue
+                if any(is_keyword(word[:e]) and is_keyword(word[e:]) for e in range(2, len_word - 1)):
+                    continue
+                compounds_.add(word)
+
+                # same with _filter_subtokens
+                if word[:2] in prefixes:
+                    continue
+                prefixes.add(word[:2])
+                keywords[word] = float(values[pos])
+                if len(keywords) >= num_keywords:
+                    break
+            k = min(lpos.shape[0], 4 * k)
+
+        self.instrument.count('extract_keywords.visited', num_visited)
+        return keywords
+
+    def _split_rank(self, rank):
+        """
+        Returns
+        -------
+        lset : dict
+            {str:float} rank of L subwords
+        rset : dict
+            {str:float} rank of R subwords
+        """
+        lset, rset = {}, {}
+        decode = self.vocabulary.decode
+        for idx, r in rank.items():
+            subword, side = decode(idx)
+            if side == 'L':
+                lset[subword] = r
+            else:
+                rset[subword] = r
+        return lset, rset
 
     def _select_keywords(self, lset, rset):
+        # a word is compound if one of its prefixes is selected keyword and also R subword.
+        # those keywords are kept in a set, thus a prefix is checked with one lookup
         keywords = {}
+        prefixes = set()
         for word, r in sorted(lset.items(), key=lambda x:x[1], reverse=True):
             len_word = len(word)
             if len_word == 1:
@@ -235,18 +508,21 @@ class KRWordRank:
 
             is_compound = False
             for e in range(2, len_word):
-                if (word[:e] in keywords) and (word[:e] in rset):
+                if word[:e] in prefixes:
                     is_compound = True
                     break
 
             if not is_compound:
                 keywords[word] = r
+                if word in rset:
+                    prefixes.add(word)
 
         return keywords
 
-    def _filter_compounds(self, keywords):
+    def _filter_compounds(self, keywords, is_sorted=False):
         keywords_= {}
-        for word, r in sorted(keywords.items(), key=lambda x:x[1], reverse=True):
+        items = keywords.items() if is_sorted else sorted(keywords.items(), key=lambda x:x[1], reverse=True)
+        for word, r in items:
             len_word = len(word)
 
             if len_word <= 2:
@@ -269,78 +545,525 @@ class KRWordRank:
 
         return keywords_
 
-    def _filter_subtokens(self, keywords):
-        subtokens = set()
+    def _filter_subtokens(self, keywords, is_sorted=False):
+        # a word shares a prefix (len >= 2) with a selected keyword if and only if
+        # their first two characters are same. So it keeps only 2-prefixes of keywords
+        # instead of all prefixes.
+        prefixes = set()
         keywords_ = {}
 
-        for word, r in sorted(keywords.items(), key=lambda x:x[1], reverse=True):
-            subs = {word[:e] for e in range(2, len(word)+1)}
-
-            is_subtoken = False
-            for sub in subs:
-                if sub in subtokens:
-                    is_subtoken = True
-                    break
+        items = keywords.items() if is_sorted else sorted(keywords.items(), key=lambda x:x[1], reverse=True)
+        for word, r in items:
+            if len(word) < 2:
+                keywords_[word] = r
+                continue
 
-            if not is_subtoken:
+            prefix = word[:2]
+            if prefix not in prefixes:
                 keywords_[word] = r
-                subtokens.update(subs)
+                prefixes.add(prefix)
 
         return keywords_
 
-    def train(self, docs, beta=0.85, max_iter=10, vocabulary=None, bias=None):
+    def train(self, docs, beta=0.85, max_iter=10, vocabulary=None, bias=None, engine='dict'):
         """
         It constructs word graph and trains ranks of each node using HITS algorithm.
         Use this function only when you want to train rank of subwords
 
         Arguments
         ---------
-        docs : list of str
-            Sentence list.
+        docs : list of str, str or re-iterable object
+            Sentence list. File path or generator factory is also available.
+            See krwordrank.corpus.as_reiterable
         beta : float
             PageRank damping factor. 0 < beta < 1
             Default is 0.85
         max_iter : int
             Maximum number of iterations of HITS algorithm.
             Default is 10
-        vocabulary : None or dict
-            User specified vocabulary to index mapper
+        vocabulary : None, dict or Vocabulary
+            User specified vocabulary to index mapper. {(subword, side):int}
         bias : None or dict
             User specified HITS bias term
             {str: float} Format
+        engine : str
+            HITS implementation. Choose one of ['dict', 'csr']
+            'dict' uses dict of dict graph (reference implementation).
+            'csr' uses scipy.sparse.csr_matrix graph and sparse matrix product.
+            Default is 'dict'
 
         Returns
         -------
         rank : dict
             subword : rank dictionary. {int:float}
-        graph : dict of dict
-            Adjacent subword graph. {int:{int:float}}
+        graph : dict of dict or scipy.sparse.csr_matrix
+            Adjacent subword graph. {int:{int:float}} if engine is 'dict'
+            (n vocabs, n vocabs) shape sparse matrix if engine is 'csr'
         """
+        if engine not in {'dict', 'csr'}:
+            raise ValueError("engine must be 'dict' or 'csr', but %s" % str(engine))
+
+        docs = as_reiterable(docs)
+        self._prepare_vocabulary(docs, vocabulary)
+
+        if engine == 'csr':
+            graph = self._construct_word_graph_csr(docs)
+        else:
+            graph = self._construct_word_graph(docs)
+
+        rank = self._rank(graph, beta, max_iter, bias, engine)
+        self.rank, self.graph = rank, graph
+        return rank, graph
+
+    def _prepare_vocabulary(self, docs, vocabulary):
         if (not vocabulary) and (not self.vocabulary):
             self.scan_vocabs(docs)
-        elif (not vocabulary):
+        elif vocabulary:
             self.vocabulary = vocabulary
             self._build_index2vocab()
 
-        graph = self._construct_word_graph(docs)
+    def extract_with_biases(self, docs, biases, beta=0.85, max_iter=10, num_keywords=-1,
+        num_rset=-1, vocabulary=None):
+        """
+        It extracts keywords with many HITS bias terms, for example seed words of each category,
+        over one subword graph. The graph is constructed once, and the ranks of all biases
+        are trained together by `krwordrank.graph.hits_batch`. The result of each bias is same
+        with `extract(docs, beta, max_iter, bias=bias, engine='csr')`.
+
+            >>> biases = {'music': {'음악': 10.0, 'ost': 10.0}, 'actor': {'배우': 10.0, '연기': 10.0}}
+            >>> keywords, ranks, graph = wordrank_extractor.extract_with_biases(texts, biases)
+            >>> keywords['music']
+            $ {'음악': 45.2, ...}
+
+        It uses (n vocabs, n biases) float64 dense matrices. If the number of biases
+        is large, split them into several calls with docs=None.
+
+        Arguments
+        ---------
+        docs : None, list of str, str or re-iterable object
+            Sentence list. File path or generator factory is also available.
+            See krwordrank.corpus.as_reiterable
+            If None, it uses the graph of trained (or loaded) KR-WordRank
+        biases : list of dict or dict of dict
+            HITS bias terms. Each bias is {str:float} formed like `bias` of `train`.
+            If it is dict, {key:bias}
+        beta : float
+            PageRank damping factor. 0 < beta < 1
+            Default is 0.85
+        max_iter : int
+            Maximum number of iterations of HITS algorithm.
+            Default is 10
+        num_keywords : int
+            Number of keywords sorted by rank.
+            Default is -1. If the vaule is negative, it returns all extracted words.
+        num_rset : int
+            Number of R set words sorted by rank. It will be used to L-part word filtering.
+            Default is -1.
+        vocabulary : None, dict or Vocabulary
+            User specified vocabulary to index mapper. {(subword, side):int}
+
+        Returns
+        -------
+        keywords : list of dict or dict of dict
+            Keywords of each bias. {str:float}
+        ranks : list of dict or dict of dict
+            Rank of each bias. {int:float}
+        graph : scipy.sparse.csr_matrix
+            (n vocabs, n vocabs) shape inbound subword graph
+        """
+        if docs is None:
+            if self.graph is None:
+                raise ValueError('docs is None, but KR-WordRank has not been trained')
+            graph = self.graph
+            if isinstance(graph, dict):
+                graph = dict_to_csr(graph, len(self.vocabulary))
+        else:
+            docs = as_reiterable(docs)
+            self._prepare_vocabulary(docs, vocabulary)
+            graph = self._construct_word_graph_csr(docs)
+            self.graph = graph
+
+        keys = list(biases) if isinstance(biases, dict) else None
+        ranks = self._rank_biases(graph, beta, max_iter,
+            list(biases.values()) if keys is not None else list(biases))
+        keywords = [self._extract_keywords(rank, num_keywords, num_rset) for rank in ranks]
+        if keys is not None:
+            return dict(zip(keys, keywords)), dict(zip(keys, ranks)), graph
+        return keywords, ranks, graph
+
+    def partial_fit(self, docs, beta=0.85, max_iter=10, num_keywords=-1, num_rset=-1,
+        bias=None, expired_docs=None, engine='dict'):
+        """
+        It updates KR-WordRank with appended documents, and optionally removes
+        expired documents, for example to maintain sliding window of recent comments.
+
+        It keeps subword counts and undirected link counts of all fitted documents
+        (see SubwordStatistics). Subwords and links are generated only from the unique
+        tokens and adjacent token pairs of appended and expired documents, and they are
+        applied to the tables as +/- deltas. Then vocabulary is re-selected with min_count
+        and subword graph is re-indexed with vectorized operations, whose cost is
+        proportional to the size of the tables. HITS is warm-started from the rank of
+        previous fitting.
+
+        It can not update the extractor trained with `train`, `extract` or loaded by `load`,
+        because they do not keep the statistics of documents.
+
+        The subword graph is same with the graph trained from all remaining documents
+        with `train`. The indices of subwords may differ only if some documents are removed.
+
+        Arguments
+        ---------
+        docs : list of str, str or re-iterable object
+            Appended documents
+        beta : float
+            PageRank damping factor. 0 < beta < 1
+            Default is 0.85
+        max_iter : int
+            Maximum number of iterations of HITS algorithm.
+            Default is 10
+        num_keywords : int
+            Number of keywords sorted by rank.
+            Default is -1. If the vaule is negative, it returns all extracted words.
+        num_rset : int
+            Number of R set words sorted by rank. It will be used to L-part word filtering.
+            Default is -1.
+        bias : None or dict
+            User specified HITS bias term
+        expired_docs : None, list of str, str or re-iterable object
+            Documents to be removed. They should be fitted before.
+        engine : str
+            HITS implementation. Choose one of ['dict', 'csr']
+            Default is 'dict'
+
+        Returns
+        -------
+        keywords : dict
+            word : rank dictionary. {str:float}
+        rank : dict
+            subword : rank dictionary. {int:float}
+        graph : dict of dict or scipy.sparse.csr_matrix
+            Adjacent subword graph.
+
+        Usage
+        -----
+            >>> wordrank_extractor = KRWordRank()
+            >>> keywords, rank, graph = wordrank_extractor.partial_fit(texts_of_first_hour)
+            >>> keywords, rank, graph = wordrank_extractor.partial_fit(
+            >>>     texts_of_second_hour, expired_docs=texts_of_first_hour)
+        """
+        if engine not in {'dict', 'csr'}:
+            raise ValueError("engine must be 'dict' or 'csr', but %s" % str(engine))
+
+        if self._statistics is None:
+            if len(self.rank) > 0 or self.graph is not None:
+                raise ValueError('partial_fit can not update KR-WordRank fitted without '\
+                    'partial_fit, because it has no statistics of the fitted documents')
+            self._statistics = SubwordStatistics()
+        if expired_docs is not None:
+            expired_docs = as_reiterable(expired_docs)
+
+        # previous rank, {(subword, side):float}
+        previous_rank = {self.int2token(idx):r for idx, r in self.rank.items()}
+
+        with self.instrument.timer('scan_vocabs'):
+            self._statistics.update(self, self._progress(as_reiterable(docs), 'scan_vocabs'), expired_docs)
+            self.instrument.count('scan_vocabs.candidates', int((self._statistics.counts > 0).sum()))
+            self.vocabulary, ids = self._statistics.vocabulary(self.min_count)
+            self._build_index2vocab()
+            self.instrument.count('scan_vocabs.vocabs', len(self.vocabulary))
+        if self.verbose:
+            print('num vocabs = %d' % len(self.vocabulary))
+
+        with self.instrument.timer('construct_word_graph'):
+            graph = self._graph_of_subword_statistics(self._statistics, ids, engine)
+            self._count_edges(graph)
+
+        initial_rank = {}
+        for token, r in previous_rank.items():
+            idx = self.token2int(token)
+            if idx >= 0:
+                initial_rank[idx] = r
+
+        rank = self._rank(graph, beta, max_iter, bias, engine, initial_rank)
+        self.rank, self.graph = rank, graph
+        keywords = self._extract_keywords(rank, num_keywords, num_rset)
+        return keywords, rank, graph
+
+    def _graph_of_subword_statistics(self, statistics, ids, engine):
+        l_nodes, r_nodes, counts = statistics.encoded_links(ids)
+        self._count_dropped_links(int(statistics.link_counts.sum()), int(counts.sum()))
+        n_vocabs = ids.shape[0]
+        # each undirected link is added in both directions like `_count_links`
+        counts = csr_matrix((np.concatenate([counts, counts]),
+            (np.concatenate([l_nodes, r_nodes]), np.concatenate([r_nodes, l_nodes]))),
+            shape=(n_vocabs, n_vocabs))
+        graph = _normalize_csr(counts)
+        if engine == 'dict':
+            graph = _csr_to_dict(graph)
+        return graph
+
+    def _count_links_of_statistics(self, statistics, engine):
+        def links_with_frequency():
+            for token, freq in statistics.tokens.items():
+                yield self._intra_link(token), freq
+            for (t_left, t_curr), freq in statistics.rsub_pairs.items():
+                yield self._rsub_to_token(t_left, t_curr), freq
+            for (t_curr, t_rigt), freq in statistics.lsub_pairs.items():
+                yield self._token_to_lsub(t_curr, t_rigt), freq
+
+        num_links, num_encoded = 0, 0
+        if engine == 'csr':
+            rows, cols, data = array('i'), array('i'), array('q')
+            for links, freq in links_with_frequency():
+                encoded = self._encode_token(links)
+                num_links += len(links) * freq
+                num_encoded += len(encoded) * freq
+                for l_node, r_node in encoded:
+                    rows.append(l_node)
+                    cols.append(r_node)
+                    data.append(freq)
+            self._count_dropped_links(num_links, num_encoded)
+            n_vocabs = len(self.vocabulary)
+            rows = np.frombuffer(rows, dtype=np.int32)
+            cols = np.frombuffer(cols, dtype=np.int32)
+            data = np.frombuffer(data, dtype=np.int64)
+            return csr_matrix((np.concatenate([data, data]),
+                (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+                shape=(n_vocabs, n_vocabs))
+
+        graph = defaultdict(lambda: defaultdict(lambda: 0))
+        for links, freq in links_with_frequency():
+            encoded = self._encode_token(links)
+            num_links += len(links) * freq
+            num_encoded += len(encoded) * freq
+            for l_node, r_node in encoded:
+                graph[l_node][r_node] += freq
+                graph[r_node][l_node] += freq
+        self._count_dropped_links(num_links, num_encoded)
+        return graph
+
+    def sweep(self, docs, min_count=None, max_length=None, beta=0.85, max_iter=10,
+        num_rset=-1, num_keywords=-1, bias=None, engine='dict', evaluate=None):
+        """
+        It extracts keywords with every combination of training parameters.
+        Each of min_count, max_length, beta, max_iter and num_rset is a value or a list of values.
+
+        Documents are scanned only once, into token and adjacent token pair frequencies
+        (see CorpusStatistics). Subword graph is counted once with the loosest configuration
+        (the smallest min_count and the largest max_length), and the graph of a stricter
+        configuration is the restriction of the loose graph to its vocabulary.
+        The graph of each (min_count, max_length) is shared by all beta and max_iter,
+        and HITS of larger max_iter is warm-started from the rank of smaller max_iter.
+        The rank of each (min_count, max_length, beta, max_iter) is shared by all num_rset.
+
+        The vocabulary and the graph of each configuration are same with `train`.
+        With engine 'csr' the keywords are also same, and with engine 'dict' the rank may
+        differ in floating point error because the edges are summed in different order.
+
+            >>> wordrank_extractor = KRWordRank()
+            >>> results = wordrank_extractor.sweep(texts, min_count=[3, 5, 10],
+            >>>     max_length=[6, 10], beta=[0.8, 0.85], max_iter=[10, 20], num_keywords=100)
+            >>> for result in results:
+            >>>     print(result.min_count, result.max_length, result.elapsed, list(result.keywords)[:5])
+
+        Arguments
+        ---------
+        docs : list of str, str or re-iterable object
+            Sentence list. File path or generator factory is also available.
+            See krwordrank.corpus.as_reiterable
+        min_count : None, int or list of int
+            Default is self.min_count
+        max_length : None, int or list of int
+            Default is self.max_length
+        beta : float or list of float
+            Default is 0.85
+        max_iter : int or list of int
+            Default is 10
+        num_rset : int or list of int
+            Default is -1
+        num_keywords : int
+            Number of keywords sorted by rank.
+            Default is -1. If the vaule is negative, it returns all extracted words.
+        bias : None or dict
+            User specified HITS bias term
+        engine : str
+            HITS implementation. Choose one of ['dict', 'csr']
+            Default is 'dict'
+        evaluate : None or callable
+            If it is given, the score of each configuration is evaluate(keywords).
+            See evaluation.rouge1_evaluator
 
+        Returns
+        -------
+        results : list of SweepResult
+            SweepResult(min_count, max_length, beta, max_iter, num_rset, keywords, elapsed, score)
+            ordered by (max_length, min_count, beta, max_iter, num_rset).
+            elapsed is seconds of HITS, including the shared iterations of smaller max_iter,
+            and keyword extraction. Scanning and graph construction are reported to instrument.
+            score is None if evaluate is None.
+        """
+        if engine not in {'dict', 'csr'}:
+            raise ValueError("engine must be 'dict' or 'csr', but %s" % str(engine))
+
+        min_counts = _as_grid(self.min_count if min_count is None else min_count)
+        max_lengths = _as_grid(self.max_length if max_length is None else max_length)
+        betas, max_iters, num_rsets = _as_grid(beta), _as_grid(max_iter), _as_grid(num_rset)
+
+        statistics = CorpusStatistics()
+        with self.instrument.timer('scan_vocabs'):
+            statistics.add(self._progress(as_reiterable(docs), 'scan_vocabs'))
+
+        # link counts of the loosest configuration
+        loose = self._sweep_extractor(min_counts[0], max_lengths[-1])
+        loose._vocabulary_from_counter(statistics.count_subwords(max_lengths[-1]))
+        with self.instrument.timer('construct_word_graph'):
+            counts = loose._count_links_of_statistics(statistics, engine)
+
+        results = []
+        for max_length_ in max_lengths:
+            with self.instrument.timer('scan_vocabs'):
+                counter = statistics.count_subwords(max_length_)
+                # the vocabulary of larger min_count is a prefix of these tokens
+                tokens = sorted(counter.items(), key=lambda x:x[1], reverse=True)
+                # index of loose vocabulary to the position in tokens
+                loose_index = np.asarray([loose.vocabulary.index(subword, side)
+                    for (subword, side), freq in tokens if freq >= min_counts[0]], dtype=np.int64)
+
+            for min_count_ in min_counts:
+                extractor = self._sweep_extractor(min_count_, max_length_)
+                extractor._vocabulary_from_counter(tokens)
+                with self.instrument.timer('construct_word_graph'):
+                    graph = _restrict_counts(counts, loose_index[:len(extractor.vocabulary)],
+                        len(loose.vocabulary), engine)
+                    graph = _normalize_csr(graph) if engine == 'csr' else _normalize(graph)
+                    self._count_edges(graph)
+
+                for beta_ in betas:
+                    rank, num_iter, elapsed, converged = None, 0, 0, False
+                    for max_iter_ in max_iters:
+                        if not converged:
+                            # iterations from previous rank are same with the following iterations of
+                            # training from scratch, unless HITS has early stopped at previous rank.
+                            threshold = _threshold('l1', 0.001, extractor.sum_weight, len(extractor.vocabulary))
+                            history = []
+                            begin = time.perf_counter()
+                            rank = extractor._rank(graph, beta_, max_iter_ - num_iter, bias, engine, rank,
+                                callback=lambda n_iter, residual, _: history.append(residual))
+                            elapsed += time.perf_counter() - begin
+                            num_iter += len(history)
+                            converged = (num_iter < max_iter_) or (bool(history) and history[-1] < threshold)
+
+                        for num_rset_ in num_rsets:
+                            begin = time.perf_counter()
+                            keywords = extractor._extract_keywords(rank, num_keywords, num_rset_)
+                            elapsed_ = elapsed + time.perf_counter() - begin
+                            score = evaluate(keywords) if evaluate is not None else None
+                            results.append(SweepResult(min_count_, max_length_, beta_, max_iter_,
+                                num_rset_, keywords, elapsed_, score))
+        return results
+
+    def _sweep_extractor(self, min_count, max_length):
+        return KRWordRank(min_count = min_count, max_length = max_length,
+            verbose = self.verbose, instrument = self.instrument, memo_size = self.memo_size)
+
+    def _vocabulary_from_counter(self, counter):
+        """
+        Arguments
+        ---------
+        counter : dict or list of tuple
+            {(subword, side):frequency}, or (token, frequency) list sorted by frequency
+
+        Returns
+        -------
+        counter : dict
+            {(subword, side):frequency} whose frequency is larger than or equal to min_count
+        """
+        if isinstance(counter, dict):
+            self.instrument.count('scan_vocabs.candidates', len(counter))
+            counter = {token:freq for token, freq in counter.items() if freq >= self.min_count}
+            tokens = sorted(counter.items(), key=lambda x:x[1], reverse=True)
+        else:
+            tokens = [(token, freq) for token, freq in counter if freq >= self.min_count]
+            counter = dict(tokens)
+        self.instrument.count('scan_vocabs.vocabs', len(counter))
+        self.vocabulary = Vocabulary.from_tokens(token for token, _ in tokens)
+        self._build_index2vocab()
+        return counter
+
+    def _rank(self, graph, beta, max_iter, bias, engine, initial_rank=None, callback=None):
+        with self.instrument.timer('hits'):
+            rank = self._hits(graph, beta, max_iter, bias, engine, initial_rank, callback)
+        self.instrument.count('hits.nodes', len(rank))
+        return rank
+
+    def _hits(self, graph, beta, max_iter, bias, engine, initial_rank, callback=None):
+        if self.instrument.enabled:
+            callback_ = callback
+            def callback(num_iter, residual, elapsed):
+                self.instrument.count('hits.iterations')
+                if callback_ is not None:
+                    callback_(num_iter, residual, elapsed)
         # add custom bias dict
+        encoded_bias = self._encode_bias(bias)
+
+        if engine == 'csr':
+            n_vocabs = len(self.vocabulary)
+            # same error with `hits` before dividing by the number of nodes
+            _check_number_of_nodes(n_vocabs)
+            dense_bias = np.full(n_vocabs, self.sum_weight / n_vocabs)
+            for idx, value in encoded_bias.items():
+                dense_bias[idx] = value
+            if initial_rank is not None:
+                dense_rank = np.full(n_vocabs, self.sum_weight / n_vocabs)
+                for idx, value in initial_rank.items():
+                    dense_rank[idx] = value
+                initial_rank = dense_rank
+            rank = hits_csr(graph, beta, max_iter, dense_bias,
+                        sum_weight=self.sum_weight,
+                        number_of_nodes=n_vocabs,
+                        verbose=self.verbose,
+                        initial_rank=initial_rank,
+                        callback=callback
+                        )
+        else:
+            rank = hits(graph, beta, max_iter, encoded_bias,
+                        sum_weight=self.sum_weight,
+                        number_of_nodes=len(self.vocabulary),
+                        verbose=self.verbose,
+                        initial_rank=initial_rank,
+                        callback=callback
+                        )
+        return rank
+
+    def _encode_bias(self, bias):
         encoded_bias = {}
-        custom_bias_dict = bias
-
-        if custom_bias_dict:
-            for word, value in custom_bias_dict.items():
+        if bias:
+            for word, value in bias.items():
                 encoded_word = self.token2int((word, 'L'))
                 if encoded_word != -1:
                     encoded_bias[encoded_word] = value
-
-        rank = hits(graph, beta, max_iter, encoded_bias,
-                    sum_weight=self.sum_weight,
-                    number_of_nodes=len(self.vocabulary),
-                    verbose=self.verbose
-                    )
-
-        return rank, graph
+        return encoded_bias
+
+    def _rank_biases(self, graph, beta, max_iter, biases):
+        n_vocabs = len(self.vocabulary)
+        _check_number_of_nodes(n_vocabs)
+        dense_biases = np.full((n_vocabs, len(biases)), self.sum_weight / n_vocabs)
+        for j, bias in enumerate(biases):
+            for idx, value in self._encode_bias(bias).items():
+                dense_biases[idx, j] = value
+
+        callback = None
+        if self.instrument.enabled:
+            callback = lambda num_iter, num_active, elapsed: self.instrument.count('hits.iterations')
+        with self.instrument.timer('hits'):
+            ranks = hits_batch(graph, beta, max_iter, dense_biases,
+                        sum_weight=self.sum_weight,
+                        number_of_nodes=n_vocabs,
+                        verbose=self.verbose,
+                        callback=callback
+                        )
+        self.instrument.count('hits.nodes', sum(len(rank) for rank in ranks))
+        return ranks
 
     def token2int(self, token):
         """
@@ -356,7 +1079,11 @@ class KRWordRank:
             Corresponding index
             If it is unknown, it returns -1
         """
-        return self.vocabulary.get(token, -1)
+        try:
+            subword, side = token
+        except (TypeError, ValueError):
+            return -1
+        return self.vocabulary.index(subword, side)
 
     def int2token(self, index):
         """
@@ -372,46 +1099,246 @@ class KRWordRank:
             For example, ('이것', 'L') or ('은', 'R').
             If it is unknown, it returns None
         """
-        return self.index2vocab[index] if (0 <= index < len(self.index2vocab)) else None
+        return self.vocabulary.decode(index) if (0 <= index < len(self.vocabulary)) else None
 
     def _construct_word_graph(self, docs):
-        def normalize(graph):
-            graph_ = defaultdict(lambda: defaultdict(lambda: 0))
-            for from_, to_dict in graph.items():
-                sum_ = sum(to_dict.values())
-                for to_, w in to_dict.items():
-                    graph_[to_][from_] = w / sum_
-            graph_ = {t:dict(fd) for t, fd in graph_.items()}
-            return graph_
+        with self.instrument.timer('construct_word_graph'):
+            graph = self._construct_word_graph_dict(docs)
+            self._count_edges(graph)
+        return graph
 
-        graph = defaultdict(lambda: defaultdict(lambda: 0))
-        for doc in docs:
+    def _construct_word_graph_dict(self, docs):
+        docs = self._progress(docs, 'construct_graph')
+        if self.n_jobs == 1:
+            graph, num_links, num_encoded = self._count_links(docs)
+        else:
+            # merge partial edge counts in the order of chunks to keep the insertion order of edges
+            graph = defaultdict(lambda: defaultdict(lambda: 0))
+            num_links, num_encoded = 0, 0
+            chunks = chunked(docs, self.n_jobs)
+            for partial_graph, n_links, n_encoded in parallel_map(_count_links, chunks, self.n_jobs, _initialize_worker, (self,), self._pool):
+                num_links += n_links
+                num_encoded += n_encoded
+                for from_, to_dict in partial_graph.items():
+                    from_dict = graph[from_]
+                    for to_, count in to_dict.items():
+                        from_dict[to_] += count
+        self._count_dropped_links(num_links, num_encoded)
 
-            tokens = doc.split()
+        # reverse for inbound graph. but it normalized with sum of outbound weight
+        graph = _normalize(graph)
+        return graph
 
-            if not tokens:
-                continue
+    def _count_dropped_links(self, num_links, num_encoded):
+        self.instrument.count('construct_word_graph.links', num_links)
+        self.instrument.count('construct_word_graph.dropped_links', num_links - num_encoded)
 
-            links = []
-            for token in tokens:
-                links += self._intra_link(token)
+    def _count_edges(self, graph):
+        if not self.instrument.enabled:
+            return
+        if isinstance(graph, dict):
+            num_edges = sum(len(from_dict) for from_dict in graph.values())
+        else:
+            num_edges = graph.nnz
+        self.instrument.count('construct_word_graph.edges', num_edges)
 
-            if len(tokens) > 1:
-                tokens = [tokens[-1]] + tokens + [tokens[0]]
-                links += self._inter_link(tokens)
+    def _construct_word_graph_csr(self, docs, buffer_size=100000):
+        """
+        It constructs same graph with `_construct_word_graph` without nested dict.
+        Encoded links are appended to int arrays, and for every `buffer_size` links
+        they are reduced into a block of sorted unique edges and their counts.
+        See `_count_links_csr`.
 
-            links = self._check_token(links)
-            if not links:
-                continue
+        Returns
+        -------
+        graph : scipy.sparse.csr_matrix
+            (n vocabs, n vocabs) shape inbound graph. graph[to, from] = float
+            Each column is normalized with sum of outbound weight.
+        """
+        with self.instrument.timer('construct_word_graph'):
+            docs = self._progress(docs, 'construct_graph')
+            if self.n_jobs == 1:
+                counts, num_links, num_encoded = self._count_links_csr(docs, buffer_size)
+            else:
+                counts = None
+                num_links, num_encoded = 0, 0
+                chunks = chunked(docs, self.n_jobs)
+                count = partial(_count_links_csr, buffer_size=buffer_size)
+                for partial_counts, n_links, n_encoded in parallel_map(count, chunks, self.n_jobs, _initialize_worker, (self,), self._pool):
+                    counts = partial_counts if counts is None else counts + partial_counts
+                    num_links += n_links
+                    num_encoded += n_encoded
+                if counts is None:
+                    n_vocabs = len(self.vocabulary)
+                    counts = csr_matrix((n_vocabs, n_vocabs), dtype=np.int64)
+            self._count_dropped_links(num_links, num_encoded)
+            graph = _normalize_csr(counts)
+            self._count_edges(graph)
+        return graph
+
+    def _progress(self, docs, stage):
+        if self.callback is None:
+            return docs
+        return _iterate_with_callback(docs, stage, self.callback, self.callback_interval)
 
-            links = self._encode_token(links)
-            for l_node, r_node in links:
+    def _count_links(self, docs):
+        """
+        Returns
+        -------
+        graph : dict of dict
+            {int:{int:int}} symmetric link count
+        num_links : int
+            Number of generated links
+        num_encoded : int
+            Number of links whose both subwords are in vocabulary
+        """
+        graph = defaultdict(lambda: defaultdict(lambda: 0))
+        num_links, num_encoded = 0, 0
+        encode = self._link_encoder()
+        for doc in docs:
+            encoded, n_links = encode(doc)
+            num_links += n_links
+            num_encoded += len(encoded)
+            for l_node, r_node in encoded:
                 graph[l_node][r_node] += 1
                 graph[r_node][l_node] += 1
+        return graph, num_links, num_encoded
 
-        # reverse for inbound graph. but it normalized with sum of outbound weight
-        graph = normalize(graph)
-        return graph
+    def _count_links_csr(self, docs, buffer_size):
+        """
+        An undirected edge is encoded as one int64 key, min(l, r) * n_vocabs + max(l, r).
+        The keys of buffered links are reduced into a block of sorted unique keys and
+        int32 counts. Blocks are merged when the last block is not smaller than half of
+        the previous one, thus there are O(log) blocks and each key is merged O(log) times.
+        The symmetric count matrix is built once from the merged block.
+
+        Returns
+        -------
+        counts : scipy.sparse.csr_matrix
+            (n vocabs, n vocabs) symmetric link count
+        num_links : int
+            Number of generated links
+        num_encoded : int
+            Number of links whose both subwords are in vocabulary
+        """
+        n_vocabs = len(self.vocabulary)
+        l_buffer, r_buffer = array('i'), array('i')
+        blocks = []
+
+        def flush():
+            l_nodes = np.frombuffer(l_buffer, dtype=np.int32)
+            r_nodes = np.frombuffer(r_buffer, dtype=np.int32)
+            keys = np.minimum(l_nodes, r_nodes).astype(np.int64) * n_vocabs + np.maximum(l_nodes, r_nodes)
+            del l_nodes, r_nodes
+            del l_buffer[:], r_buffer[:]
+            # a count can exceed int32 only if more than 2^31 links are counted
+            dtype = np.int32 if num_encoded < 2 ** 31 else np.int64
+            blocks.append(_reduce_keys(keys, np.ones(keys.shape[0], dtype=dtype)))
+            while len(blocks) > 1 and 2 * blocks[-1][0].shape[0] >= blocks[-2][0].shape[0]:
+                last, previous = blocks.pop(), blocks.pop()
+                blocks.append(_merge_blocks(previous, last))
+
+        num_links, num_encoded = 0, 0
+        encode = self._link_encoder()
+        for doc in docs:
+            encoded, n_links = encode(doc)
+            num_links += n_links
+            num_encoded += len(encoded)
+            for l_node, r_node in encoded:
+                l_buffer.append(l_node)
+                r_buffer.append(r_node)
+            if len(l_buffer) >= buffer_size:
+                flush()
+        flush()
+        while len(blocks) > 1:
+            last, previous = blocks.pop(), blocks.pop()
+            blocks.append(_merge_blocks(previous, last))
+        return _symmetric_counts(blocks[0], n_vocabs), num_links, num_encoded
+
+    def _link_encoder(self, memo_size=None):
+        """
+        It returns a function which gives encoded links of a document and the number of
+        generated links. The links of each token are `_intra_link`, and a document is
+        a cycle of tokens, thus the last token is the left neighbor of the first token.
+        Between adjacent tokens, `_rsub_to_token` and `_token_to_lsub` links are generated.
+        It does not generate (subword, side) links. The indices of subwords of each token
+        are looked up once and memorized, and only the links between known subwords are built.
+
+        Arguments
+        ---------
+        memo_size : None or int
+            Maximum number of memorized tokens. If None, it uses self.memo_size
+
+        Returns
+        -------
+        encode : callable
+            doc -> (list of (int, int), int)
+        """
+        if memo_size is None:
+            memo_size = self.memo_size
+        lookup_l, lookup_r = _subword_lookups(self.vocabulary)
+        max_length = self.max_length
+        memo = {}
+
+        def encode_token(token):
+            # (index of token, intra links, number of intra links,
+            #  known R suffixes, known L prefixes, number of suffixes (prefixes))
+            len_token = len(token)
+            n_subs = min(10, len_token) - 1
+            prefixes = [lookup_l(token[:e]) for e in range(1, n_subs + 1)]
+            intra = []
+            n_intra = 0
+            for e in range(1, n_subs + 1):
+                if (len_token - e) > max_length:
+                    continue
+                n_intra += 1
+                l_node = prefixes[e-1]
+                if l_node is None:
+                    continue
+                r_node = lookup_r(token[e:])
+                if r_node is not None:
+                    intra.append((l_node, r_node))
+            suffixes = [lookup_r(token[-b:]) for b in range(1, n_subs + 1)]
+            return (lookup_l(token), intra, n_intra,
+                [idx for idx in suffixes if idx is not None],
+                [idx for idx in prefixes if idx is not None],
+                n_subs)
+
+        def encode(doc):
+            tokens = doc.split()
+            if not tokens:
+                return [], 0
+
+            if len(memo) > memo_size:
+                memo.clear()
+            infos = []
+            for token in tokens:
+                info = memo.get(token)
+                if info is None:
+                    info = encode_token(token)
+                    memo[token] = info
+                infos.append(info)
+
+            encoded = []
+            num_links = 0
+            for info in infos:
+                encoded += info[1]
+                num_links += info[2]
+
+            if len(infos) > 1:
+                # the last token is the left neighbor of the first token
+                infos = [infos[-1]] + infos + [infos[0]]
+                for i in range(1, len(infos) - 1):
+                    t_left, t_curr, t_rigt = infos[i-1], infos[i], infos[i+1]
+                    num_links += t_left[5] + t_rigt[5]
+                    curr = t_curr[0]
+                    if curr is None:
+                        continue
+                    encoded += [(r_sub, curr) for r_sub in t_left[3]]
+                    encoded += [(curr, l_sub) for l_sub in t_rigt[4]]
+            return encoded, num_links
+
+        return encode
 
     def _intra_link(self, token):
         links = []
@@ -422,20 +1349,211 @@ class KRWordRank:
             links.append( ((token[:e], 'L'), (token[e:], 'R')) )
         return links
 
-    def _inter_link(self, tokens):
-        def rsub_to_token(t_left, t_curr):
-            return [((t_left[-b:], 'R'), (t_curr, 'L')) for b in range(1, min(10, len(t_left)))]
-        def token_to_lsub(t_curr, t_rigt):
-            return [((t_curr, 'L'), (t_rigt[:e], 'L')) for e in range(1, min(10, len(t_rigt)))]
-
-        links = []
-        for i in range(1, len(tokens)-1):
-            links += rsub_to_token(tokens[i-1], tokens[i])
-            links += token_to_lsub(tokens[i], tokens[i+1])
-        return links
+    def _rsub_to_token(self, t_left, t_curr):
+        return [((t_left[-b:], 'R'), (t_curr, 'L')) for b in range(1, min(10, len(t_left)))]
 
-    def _check_token(self, token_list):
-        return [(token[0], token[1]) for token in token_list if (token[0] in self.vocabulary and token[1] in self.vocabulary)]
+    def _token_to_lsub(self, t_curr, t_rigt):
+        return [((t_curr, 'L'), (t_rigt[:e], 'L')) for e in range(1, min(10, len(t_rigt)))]
 
     def _encode_token(self, token_list):
-        return [(self.vocabulary[token[0]],self.vocabulary[token[1]]) for token in token_list]
+        # it skips links whose subwords are not in vocabulary
+        index = self.vocabulary.index
+        encoded = []
+        for (l_sub, l_side), (r_sub, r_side) in token_list:
+            l_node = index(l_sub, l_side)
+            if l_node < 0:
+                continue
+            r_node = index(r_sub, r_side)
+            if r_node < 0:
+                continue
+            encoded.append((l_node, r_node))
+        return encoded
+
+
+def _rank_arrays(rank):
+    """
+    Returns
+    -------
+    idxs : numpy.ndarray
+        Subword indices in the iteration order of rank
+    values : numpy.ndarray
+        float64 rank of the subwords
+    """
+    if isinstance(rank, MappedRank):
+        idxs = np.flatnonzero(~np.isnan(rank.array))
+        return idxs, rank.array[idxs].astype(np.float64)
+    idxs = np.fromiter(rank.keys(), dtype=np.int64, count=len(rank))
+    values = np.fromiter(rank.values(), dtype=np.float64, count=len(rank))
+    return idxs, values
+
+def _ranked_order(values, k):
+    """
+    Returns
+    -------
+    order : numpy.ndarray
+        Positions of the values which are larger than or equal to the k-th largest value,
+        sorted by (-value, position). It is a prefix of the stable descending sort of values.
+    """
+    n = values.shape[0]
+    if k >= n:
+        return np.argsort(-values, kind='stable')
+    threshold = np.partition(values, n - k)[n - k]
+    candidates = np.flatnonzero(values >= threshold)
+    return candidates[np.argsort(-values[candidates], kind='stable')]
+
+def _subword_lookups(vocabulary):
+    """
+    Returns
+    -------
+    lookup_l, lookup_r : callable
+        str -> int or None. Index of L (R) subword. None if it is unknown
+    """
+    if isinstance(vocabulary, Vocabulary):
+        return vocabulary.lvocab.get, vocabulary.rvocab.get
+    def lookup(side):
+        def lookup_(subword):
+            idx = vocabulary.index(subword, side)
+            return idx if idx >= 0 else None
+        return lookup_
+    return lookup('L'), lookup('R')
+
+def _as_grid(values):
+    if isinstance(values, (list, tuple, set)):
+        return sorted(set(values))
+    return [values]
+
+def _restrict_counts(counts, index, n_vocabs, engine):
+    """
+    Arguments
+    ---------
+    counts : dict of dict or scipy.sparse.csr_matrix
+        Symmetric link count of loose vocabulary
+    index : numpy.ndarray
+        index[i] is the loose vocabulary index of i-th subword of strict vocabulary
+    n_vocabs : int
+        Size of loose vocabulary
+
+    Returns
+    -------
+    counts : dict of dict or scipy.sparse.csr_matrix
+        Symmetric link count of strict vocabulary
+    """
+    if engine == 'csr':
+        return counts[index][:, index]
+
+    # loose vocabulary index to strict vocabulary index
+    strict = np.full(n_vocabs, -1, dtype=np.int64)
+    strict[index] = np.arange(len(index))
+    strict = strict.tolist()
+    counts_ = {}
+    for from_, to_dict in counts.items():
+        from_ = strict[from_]
+        if from_ < 0:
+            continue
+        from_dict = {strict[to_]:count for to_, count in to_dict.items() if strict[to_] >= 0}
+        if from_dict:
+            counts_[from_] = from_dict
+    return counts_
+
+def _normalize(graph):
+    graph_ = defaultdict(lambda: defaultdict(lambda: 0))
+    for from_, to_dict in graph.items():
+        sum_ = sum(to_dict.values())
+        for to_, w in to_dict.items():
+            graph_[to_][from_] = w / sum_
+    graph_ = {t:dict(fd) for t, fd in graph_.items()}
+    return graph_
+
+def _csr_to_dict(graph):
+    indptr = graph.indptr.tolist()
+    indices, data = graph.indices.tolist(), graph.data.tolist()
+    return {to_:dict(zip(indices[b:e], data[b:e]))
+        for to_, (b, e) in enumerate(zip(indptr[:-1], indptr[1:])) if b < e}
+
+def _merge_blocks(block_a, block_b):
+    return _reduce_keys(np.concatenate([block_a[0], block_b[0]]),
+        np.concatenate([block_a[1], block_b[1]]))
+
+def _symmetric_counts(block, n_vocabs):
+    """
+    Arguments
+    ---------
+    block : tuple of numpy.ndarray
+        Sorted unique keys, min(l, r) * n_vocabs + max(l, r), and their counts
+
+    Returns
+    -------
+    counts : scipy.sparse.csr_matrix
+        (n vocabs, n vocabs) symmetric link count. A self-loop is counted twice
+        like `_count_links`, because each link is added in both directions.
+    """
+    keys, data = block
+    # keys are sorted, thus upper triangle is already in csr order
+    rows = keys // n_vocabs
+    indices = (keys - rows * n_vocabs).astype(np.int32)
+    indptr = np.zeros(n_vocabs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_vocabs), out=indptr[1:])
+    del rows
+    upper = csr_matrix((data, indices, indptr), shape=(n_vocabs, n_vocabs))
+    return (upper + upper.T).tocsr()
+
+def _normalize_csr(counts):
+    """
+    Arguments
+    ---------
+    counts : scipy.sparse.csr_matrix
+        (n vocabs, n vocabs) shape symmetric link count matrix
+
+    Returns
+    -------
+    graph : scipy.sparse.csr_matrix
+        Inbound graph whose each column is normalized with its sum.
+        Because counts is symmetric, graph[to, from] = counts[from, to] / sum(counts[from])
+    """
+    counts.sum_duplicates()
+    outbound = np.asarray(counts.sum(axis=1), dtype=np.float64).reshape(-1)
+    data = counts.data / outbound[counts.indices]
+    return csr_matrix((data, counts.indices, counts.indptr), shape=counts.shape)
+
+
+def _iterate_with_callback(docs, stage, callback, interval):
+    num_docs = 0
+    for doc in docs:
+        yield doc
+        num_docs += 1
+        if num_docs % interval == 0:
+            callback(stage, num_docs)
+    if num_docs % interval != 0:
+        callback(stage, num_docs)
+
+# KRWordRank instance shared with worker processes. It is set by process pool initializer.
+_worker_extractor = None
+
+def _initialize_worker(extractor):
+    global _worker_extractor
+    _worker_extractor = extractor
+
+def _count_links(docs):
+    graph, num_links, num_encoded = _worker_extractor._count_links(docs)
+    return {from_:dict(to_dict) for from_, to_dict in graph.items()}, num_links, num_encoded
+
+def _count_links_csr(docs, buffer_size):
+    return _worker_extractor._count_links_csr(docs, buffer_size)
+
+def _count_subwords(docs, max_length):
+    counter = {}
+    for doc in docs:
+
+        for token in doc.split():
+            len_token = len(token)
+            counter[(token, 'L')] = counter.get((token, 'L'), 0) + 1
+
+            for e in range(1, min(len(token), max_length)):
+                if (len_token - e) > max_length:
+                    continue
+
+                l_sub = (token[:e], 'L')
+                r_sub = (token[e:], 'R')
+                counter[l_sub] = counter.get(l_sub, 0) + 1
+                counter[r_sub] = counter.get(r_sub, 0) + 1
+    return counter
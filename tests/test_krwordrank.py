@@ -1,14 +1,41 @@
+import asyncio
+from concurrent.futures import Executor
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.pool import Pool
+import numpy as np
 import os
+import pickle
 import pytest
 import sys
+from scipy.sparse import csr_matrix
+import threading
 root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, root)
 
 import krwordrank
+from krwordrank.corpus import DocumentCorpus
+from krwordrank.corpus import as_reiterable
+from krwordrank.corpus import parse_line
+from krwordrank.graph import dict_to_csr
+from krwordrank.graph import hits
+from krwordrank.graph import hits_csr
 from krwordrank.hangle import initialize_pattern
+from krwordrank.hangle import Normalizer
+from krwordrank.instrument import Collector
 from krwordrank.hangle import normalize
+from krwordrank.pipeline import SummarizationPipeline
+from krwordrank.service import AsyncSummarizer
+from krwordrank.sentence import KeywordVectorizer
+from krwordrank.sentence import MaxScoreTokenizer
+from krwordrank.sentence import SentenceIndex
+from krwordrank.sentence import make_vocab_score
 from krwordrank.sentence import summarize_with_sentences
+from krwordrank.sentence._sentence import _select_pairwise
+from krwordrank.sentence._sentence import select
 from krwordrank.word import KRWordRank
+from krwordrank.word import summarize_with_keywords
+from krwordrank.word import summarize_with_keywords_batch
+from krwordrank.word import Vocabulary
 
 # pytest execution with verbose
 # $ pytest tests/test_krwordrank.py -s -v
@@ -62,3 +89,668 @@ def test_keysentence(test_config):
     print('\nKR-WordRank key-sentence extraction 라라랜드 영화 리뷰 10 개 핵심 문장')
     for sent in sents:
         print(' - {}'.format(sent))
+
+
+def test_hits_csr_engine(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    wordrank_extractor = KRWordRank(min_count = 5, max_length = 10)
+    keywords, rank, graph = wordrank_extractor.extract(texts, beta = 0.85, max_iter = 10)
+    keywords_csr, rank_csr, graph_csr = wordrank_extractor.extract(texts, beta = 0.85, max_iter = 10, engine='csr')
+    assert graph_csr.shape == (len(wordrank_extractor.vocabulary), len(wordrank_extractor.vocabulary))
+    assert set(rank) == set(rank_csr)
+    assert all(abs(rank[idx] - rank_csr[idx]) < 1e-9 for idx in rank)
+    assert set(keywords) == set(keywords_csr)
+
+    # empty vocabulary raises same error with both engines
+    for engine in ['dict', 'csr']:
+        with pytest.raises(ValueError):
+            KRWordRank().extract([''] * 3, engine=engine)
+    with pytest.raises(ValueError):
+        KRWordRank().extract_with_biases([''] * 3, [{}])
+
+
+def test_csr_word_graph(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    wordrank_extractor = KRWordRank(min_count = 5, max_length = 10)
+    wordrank_extractor.scan_vocabs(texts)
+    graph = wordrank_extractor._construct_word_graph(texts)
+    graph_csr = wordrank_extractor._construct_word_graph_csr(texts, buffer_size=1000)
+    graph_dict = dict_to_csr(graph, len(wordrank_extractor.vocabulary))
+    assert graph_csr.nnz == graph_dict.nnz
+    assert abs(graph_csr - graph_dict).max() == 0
+
+
+def test_vocabulary():
+    vocabulary = Vocabulary.from_dict({('영화', 'L'): 0, ('는', 'R'): 1, ('영화', 'R'): 2})
+    assert len(vocabulary) == 3
+    assert vocabulary[('영화', 'R')] == 2
+    assert ('는', 'L') not in vocabulary
+    assert vocabulary.index2vocab[1] == ('는', 'R')
+    assert dict(vocabulary) == {('영화', 'L'): 0, ('는', 'R'): 1, ('영화', 'R'): 2}
+
+    wordrank_extractor = KRWordRank(min_count = 1, max_length = 10)
+    wordrank_extractor.scan_vocabs(['영화는 영화 음악이 좋은 영화'])
+    idx = wordrank_extractor.token2int(('영화', 'L'))
+    assert idx >= 0
+    assert wordrank_extractor.int2token(idx) == ('영화', 'L')
+    assert wordrank_extractor.token2int(('없는단어', 'L')) == -1
+    assert wordrank_extractor.int2token(len(wordrank_extractor.vocabulary)) is None
+
+
+def test_parallel_scan_vocabs(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    serial = KRWordRank(min_count = 5, max_length = 10)
+    parallel = KRWordRank(min_count = 5, max_length = 10, n_jobs = 2)
+    assert serial.scan_vocabs(texts) == parallel.scan_vocabs(texts)
+    assert list(serial.vocabulary.items()) == list(parallel.vocabulary.items())
+
+
+def test_parallel_word_graph(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    serial = KRWordRank(min_count = 5, max_length = 10)
+    rank, graph = serial.train(texts, beta = 0.85, max_iter = 10)
+
+    parallel = KRWordRank(min_count = 5, max_length = 10, n_jobs = 2)
+    rank_, graph_ = parallel.train(texts, beta = 0.85, max_iter = 10, vocabulary = dict(serial.vocabulary))
+    assert graph == graph_ and list(graph) == list(graph_)
+    assert rank == rank_
+
+    _, graph_csr = serial.train(texts, beta = 0.85, max_iter = 10, engine = 'csr')
+    _, graph_csr_ = parallel.train(texts, beta = 0.85, max_iter = 10, engine = 'csr')
+    assert abs(graph_csr - graph_csr_).max() == 0
+
+    # shared pool receives the extractor once per corpus through a temporal file, not with each task
+    sizes = []
+    class RecordingPool(Pool):
+        def imap(self, func, iterable, chunksize=1):
+            sizes.append(len(pickle.dumps(func)))
+            return super().imap(func, iterable, chunksize)
+
+    with RecordingPool(2) as pool:
+        parallel._pool = pool
+        _, graph_ = parallel.train(texts, beta = 0.85, max_iter = 10, engine = 'csr')
+        _, graph = parallel.train(texts[:1000], beta = 0.85, max_iter = 10, engine = 'csr')
+        parallel._pool = None
+    assert abs(graph_csr - graph_).max() == 0
+    assert abs(serial.train(texts[:1000], engine = 'csr')[1] - graph).max() == 0
+    assert max(sizes) < 10000
+
+
+def test_streaming_corpus(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    corpus = DocumentCorpus(data_path, column=0, num_docs=3000)
+    assert list(corpus) == texts
+    with pytest.raises(ValueError):
+        as_reiterable(iter(texts))
+
+    progress = []
+    callback = lambda stage, num_docs: progress.append((stage, num_docs))
+    wordrank_extractor = KRWordRank(min_count = 5, max_length = 10, callback = callback, callback_interval = 1000)
+    keywords, rank, graph = wordrank_extractor.extract(corpus, beta = 0.85, max_iter = 10)
+    keywords_, rank_, graph_ = KRWordRank(min_count = 5, max_length = 10).extract(texts, beta = 0.85, max_iter = 10)
+    assert keywords == keywords_
+    assert progress == [('scan_vocabs', 1000), ('scan_vocabs', 2000), ('scan_vocabs', 3000),
+        ('construct_graph', 1000), ('construct_graph', 2000), ('construct_graph', 3000)]
+
+
+def test_partial_fit(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    def decode(extractor, graph):
+        return {extractor.int2token(to_): {extractor.int2token(from_): w for from_, w in from_dict.items()}
+            for to_, from_dict in graph.items()}
+
+    batch = KRWordRank(min_count = 5, max_length = 10)
+    _, graph = batch.train(texts, beta = 0.85, max_iter = 10)
+
+    online = KRWordRank(min_count = 5, max_length = 10)
+    online.partial_fit(texts[:1000])
+    keywords, rank, graph_ = online.partial_fit(texts[1000:])
+    assert dict(online.vocabulary) == dict(batch.vocabulary)
+    assert graph_ == graph
+
+    # sliding window
+    window = KRWordRank(min_count = 5, max_length = 10)
+    _, graph = window.train(texts[1000:], beta = 0.85, max_iter = 10)
+    keywords, rank, graph_ = online.partial_fit(texts[:0], expired_docs = texts[:1000])
+    assert set(online.vocabulary) == set(window.vocabulary)
+    assert decode(online, graph_) == decode(window, graph)
+    keywords_ = window._extract_keywords(window.rank)
+    top = lambda keywords: [word for word, _ in sorted(keywords.items(), key=lambda x:-x[1])[:5]]
+    assert top(keywords) == top(keywords_)
+
+    # extractor trained without partial_fit has no statistics
+    with pytest.raises(ValueError):
+        batch.partial_fit(texts[:10])
+
+
+def test_partial_fit_delta(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:2000]
+
+    online = KRWordRank(min_count = 5, max_length = 10)
+    online.partial_fit(texts[:1900])
+
+    touched = {'tokens': set(), 'pairs': set()}
+    def wrap(name, key):
+        function = getattr(online, name)
+        def wrapped(*args):
+            touched[key].add(args if len(args) > 1 else args[0])
+            return function(*args)
+        setattr(online, name, wrapped)
+    wrap('_intra_link', 'tokens')
+    wrap('_rsub_to_token', 'pairs')
+    wrap('_token_to_lsub', 'pairs')
+
+    online.partial_fit(texts[1900:])
+    tokens, pairs = set(), set()
+    for doc in texts[1900:]:
+        doc_tokens = doc.split()
+        tokens.update(doc_tokens)
+        if len(doc_tokens) > 1:
+            doc_tokens = [doc_tokens[-1]] + doc_tokens + [doc_tokens[0]]
+            pairs.update(zip(doc_tokens, doc_tokens[1:]))
+    assert touched['tokens'] and touched['tokens'] <= tokens
+    assert touched['pairs'] and touched['pairs'] <= pairs
+
+    batch = KRWordRank(min_count = 5, max_length = 10)
+    batch.train(texts, beta = 0.85, max_iter = 10)
+    assert dict(online.vocabulary) == dict(batch.vocabulary)
+    assert online.graph == batch.graph
+
+
+def test_partial_fit_window(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:6000]
+
+    def decode(extractor, graph):
+        return {extractor.int2token(to_): {extractor.int2token(from_): w for from_, w in from_dict.items()}
+            for to_, from_dict in graph.items()}
+
+    window = KRWordRank(min_count = 3, max_length = 10)
+    window.partial_fit(texts[:500])
+    for i in range(1, 12):
+        window.partial_fit(texts[i*500:(i+1)*500], expired_docs = texts[(i-1)*500:i*500])
+        # dead subword ids are compacted
+        statistics = window._statistics
+        assert len(statistics.subwords) <= 2 * (statistics.counts > 0).sum() + 1
+
+    batch = KRWordRank(min_count = 3, max_length = 10)
+    _, graph = batch.train(texts[5500:], beta = 0.85, max_iter = 10)
+    assert set(window.vocabulary) == set(batch.vocabulary)
+    assert decode(window, window.graph) == decode(batch, graph)
+
+
+def test_hits_telemetry():
+    graph = {0: {1: 1.0}, 1: {0: 0.5, 2: 1.0}, 2: {0: 0.5}}
+    csr = dict_to_csr(graph, 3)
+    logs = []
+    rank, history = hits(graph, 0.85, max_iter=30, verbose=False, sum_weight=3,
+        converge=1e-6, callback=lambda *args: logs.append(args), return_history=True)
+    rank_csr, history_csr = hits_csr(csr, 0.85, max_iter=30, verbose=False, sum_weight=3,
+        converge=1e-6, return_history=True)
+    assert [tuple(h) for h in history] == logs
+    assert len(history) == len(history_csr) < 30
+    assert all(abs(rank[i] - rank_csr[i]) < 1e-9 for i in rank)
+
+    # warm-start from converged rank stops immediately
+    _, history = hits(graph, 0.85, max_iter=30, verbose=False, sum_weight=3,
+        converge=1e-6, initial_rank=rank, return_history=True)
+    assert len(history) == 1
+
+    for stop_rule in ['relative_l1', 'linf']:
+        _, history = hits(graph, 0.85, max_iter=30, verbose=False, sum_weight=3,
+            converge=1e-6, stop_rule=stop_rule, return_history=True)
+        assert len(history) < 30
+    _, history = hits(graph, 0.85, max_iter=30, verbose=False, converge=0, max_time=0, return_history=True)
+    assert len(history) == 1
+    with pytest.raises(ValueError):
+        hits(graph, 0.85, stop_rule='l2')
+
+
+def test_save_and_load(test_config, tmp_path):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    wordrank_extractor = KRWordRank(min_count = 5, max_length = 10)
+    keywords, rank, graph = wordrank_extractor.extract(texts, beta = 0.85, max_iter = 10)
+    wordrank_extractor.save(str(tmp_path))
+
+    loaded = KRWordRank.load(str(tmp_path))
+    assert len(loaded.vocabulary) == len(wordrank_extractor.vocabulary)
+    for idx in range(len(wordrank_extractor.vocabulary)):
+        token = wordrank_extractor.int2token(idx)
+        assert loaded.int2token(idx) == token
+        assert loaded.token2int(token) == idx
+    assert loaded.token2int(('없는단어', 'L')) == -1
+    assert set(loaded.rank) == set(rank)
+    # rank is stored as float32
+    rank_ = {idx:float(np.float32(r)) for idx, r in rank.items()}
+    assert dict(loaded.rank.items()) == rank_
+    assert sorted(loaded.rank.values()) == sorted(rank_.values())
+    assert abs(loaded.graph - dict_to_csr(graph, len(wordrank_extractor.vocabulary))).max() < 1e-6
+    top = lambda keywords: [word for word, _ in sorted(keywords.items(), key=lambda x:-x[1])[:10]]
+    assert top(loaded.extract_keywords()) == top(keywords)
+
+
+def test_keywords_batch():
+    corpora = {}
+    for name, num_docs in [('134963', 3000), ('91031', 700), ('99714', 500)]:
+        with open('{}/data/{}_norm.txt'.format(root, name), encoding='utf-8') as f:
+            corpora[name] = [line.rsplit('\t')[0].strip() for line in f][:num_docs]
+
+    keywords = summarize_with_keywords_batch(corpora, num_keywords=30, n_jobs=2,
+        large_corpus_size=2000, pack_size=1500)
+    assert list(keywords) == list(corpora)
+    for name, texts in corpora.items():
+        assert keywords[name] == summarize_with_keywords(texts, num_keywords=30)
+
+
+def test_select(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    keywords = KRWordRank(min_count = 5, max_length = 10).extract(texts, beta = 0.85, max_iter = 10)[0]
+    vocab_score = make_vocab_score(keywords, {}, topk=100)
+    vectorizer = KeywordVectorizer(MaxScoreTokenizer(vocab_score).tokenize, vocab_score)
+    x = vectorizer.vectorize(texts)
+    keyvec = vectorizer.keyword_vector.reshape(1,-1)
+    initial_penalty = np.asarray([0 if 25 <= len(text) <= 80 else 1 for text in texts])
+    for diversity in [0, 0.3, 1.0]:
+        expected = _select_pairwise(x, keyvec, texts, initial_penalty, 30, diversity)
+        assert select(x, keyvec, texts, initial_penalty, 30, diversity) == expected
+        assert select(x, keyvec, texts, initial_penalty, 30, diversity, shortlist=10) == expected
+
+
+def test_sentence_index(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    keywords = KRWordRank(min_count = 5, max_length = 10).extract(texts, beta = 0.85, max_iter = 10)[0]
+    vocab_score = make_vocab_score(keywords, {}, topk=100)
+    vectorizer = KeywordVectorizer(MaxScoreTokenizer(vocab_score).tokenize, vocab_score)
+    x = vectorizer.vectorize(texts)
+    keyvec = vectorizer.keyword_vector.reshape(1,-1)
+    initial_penalty = np.zeros(len(texts))
+
+    index = SentenceIndex(x)
+    idxs = index.select(keyvec, initial_penalty, 10, 0.3, max_candidates=len(texts))
+    assert index.is_exact
+    assert idxs == select(x, keyvec, texts, initial_penalty, 10, 0.3)
+
+    idxs = index.select(keyvec, initial_penalty, 10, 0.3, max_candidates=200)
+    assert index.num_scored <= 200
+    assert len(idxs) == 10
+
+    # diversity pushes all keyword-bearing sentences away, and the others have no keyword
+    x = csr_matrix(np.array([[1, 0], [1, 1], [0, 0], [0, 0], [0, 1]], dtype=np.float64))
+    keyvec = np.array([[1.0, 0.5]])
+    initial_penalty = np.array([0, 0, 0.1, 0, 0], dtype=np.float64)
+    index = SentenceIndex(x)
+    for topk in [3, 5, 8]:
+        idxs = index.select(keyvec, initial_penalty, topk, 1.0, max_candidates=x.shape[0])
+        assert index.is_exact
+        assert idxs == _select_pairwise(x, keyvec, None, initial_penalty, topk, 1.0)
+
+def test_tokenizer_engine(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    keywords = KRWordRank(min_count = 5, max_length = 10).extract(texts, beta = 0.85, max_iter = 10)[0]
+    vocab_score = make_vocab_score(keywords, {}, topk=100)
+    vocab_score['아주'] = -0.5
+    trie = MaxScoreTokenizer(vocab_score, engine='trie')
+    reference = MaxScoreTokenizer(vocab_score, engine='sort')
+    for text in texts + ['영화' * 80, '아주아주재밌는영화']:
+        assert trie.tokenize(text, flatten=False) == reference.tokenize(text, flatten=False)
+
+    with pytest.raises(ValueError):
+        MaxScoreTokenizer(vocab_score, engine='unknown')
+
+def test_tokenizer_cache(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    wordrank_extractor = KRWordRank(min_count = 5, max_length = 10)
+    keywords = wordrank_extractor.extract(texts, beta = 0.85, max_iter = 10)[0]
+    vocab_score = make_vocab_score(keywords, {}, topk=100)
+    uncached = MaxScoreTokenizer(vocab_score, cache_size=0)
+    cached = MaxScoreTokenizer(vocab_score, cache_size=1000)
+    cached.prewarm(wordrank_extractor.scan_vocabs(texts))
+    assert cached.cache_info().currsize == 1000
+
+    for text in texts:
+        assert cached.tokenize(text) == uncached.tokenize(text)
+    info = cached.cache_info()
+    assert info.hits > 0 and info.misses > 0
+    assert info.currsize == 1000
+    assert uncached.cache_info().currsize == 0
+
+def test_parallel_vectorize(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    keywords = KRWordRank(min_count = 5, max_length = 10).extract(texts, beta = 0.85, max_iter = 10)[0]
+    vocab_score = make_vocab_score(keywords, {}, topk=100)
+    tokenizer = MaxScoreTokenizer(vocab_score)
+    x = KeywordVectorizer(tokenizer.tokenize, vocab_score).vectorize(texts)
+    x_parallel = KeywordVectorizer(tokenizer.tokenize, vocab_score, n_jobs=2).vectorize(texts)
+
+    assert x.shape == x_parallel.shape == (len(texts), len(vocab_score))
+    assert (x.indptr == x_parallel.indptr).all()
+    assert (x.indices == x_parallel.indices).all()
+    assert x.data.dtype == x_parallel.data.dtype
+    for i, text in enumerate(texts[:100]):
+        terms = {term for term in tokenizer.tokenize(text) if term in vocab_score}
+        assert len(terms) == x[i].nnz
+
+def test_normalizer(test_config, tmp_path):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rstrip('\n') for line in f][:3000]
+    texts += ['어벤져스 4D 재밌다!!\t\n', '　  ', '']
+
+    normalizer = Normalizer(english=True, number=True)
+    expected = [normalize(text, english=True, number=True) for text in texts]
+    assert [normalizer(text) for text in texts] == expected
+    assert list(normalizer.normalize_docs(iter(texts), n_jobs=2)) == expected
+
+    input_path = str(tmp_path / 'input.txt')
+    output_path = str(tmp_path / 'output.txt')
+    with open(input_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(texts[:100]))
+    assert normalizer.normalize_file(input_path, output_path) == 100
+    with open(output_path, encoding='utf-8') as f:
+        assert f.read() == ''.join(doc + '\n' for doc in expected[:100])
+
+def test_pipeline(test_config, tmp_path):
+    raw_path = str(tmp_path / 'raw.txt')
+    with open(test_config['data_path'].replace('_norm', ''), encoding='utf-8') as f:
+        raws = [line for _, line in zip(range(3000), f)]
+    with open(raw_path, 'w', encoding='utf-8') as f:
+        f.write(''.join(raws))
+
+    pipeline = SummarizationPipeline(num_keywords=50, num_keysents=5, engine='dict')
+    result = pipeline.run(raw_path, column=0)
+    assert [stage.name for stage in pipeline.stages] == ['normalize', 'train', 'vectorize', 'select']
+    assert all(stage.elapsed >= 0 and stage.peak_memory > 0 for stage in pipeline.stages)
+
+    texts = [normalize(raw.split('\t')[0].strip(), english=True, number=True) for raw in raws]
+    keywords, sents, idxs = summarize_with_sentences(texts, num_keywords=50,
+        num_keysents=5, return_indices=True)
+    assert result.keywords == keywords
+    assert result.sents == sents
+    assert result.indices == list(idxs)
+    assert result.raw_sents == [raws[idx].rstrip('\n') for idx in idxs]
+    assert pipeline.num_scored == len(raws) and pipeline.is_exact
+
+    pipeline = SummarizationPipeline(num_keywords=50, num_keysents=5, engine='dict', max_candidates=100)
+    pipeline.run(raw_path, column=0)
+    assert 0 < pipeline.num_scored <= 100
+
+    # lines are splitted on newline byte, thus utf-16 is rejected, but cp949 works
+    cp949_path = str(tmp_path / 'cp949.txt')
+    with open(cp949_path, 'w', encoding='cp949', errors='replace') as f:
+        f.write(''.join(raws[:500]))
+    result = SummarizationPipeline(num_keywords=20, num_keysents=3).run(cp949_path, column=0, encoding='cp949')
+    assert len(result.sents) == 3
+    with pytest.raises(ValueError):
+        pipeline.run(raw_path, column=0, encoding='utf-16')
+
+    assert parse_line(' 재밌는 영화\t10\n', column=0) == '재밌는 영화'
+    assert parse_line('재밌는 영화,10', column=2, delimiter=',') == ''
+    assert parse_line(' 재밌는 영화 \n') == '재밌는 영화'
+
+def test_instrument(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    collector = Collector()
+    keywords, sents = summarize_with_sentences(texts, num_keywords=50, instrument=collector)
+    assert (keywords, sents) == summarize_with_sentences(texts, num_keywords=50)
+    for name in ['scan_vocabs', 'construct_word_graph', 'hits', 'extract_keywords',
+        'tokenize', 'vectorize', 'select']:
+        assert name in collector.timers
+    counters = collector.counters
+    assert counters['scan_vocabs.candidates'] >= counters['scan_vocabs.vocabs'] > 0
+    assert counters['construct_word_graph.links'] > counters['construct_word_graph.dropped_links'] > 0
+    assert counters['hits.iterations'] == 10
+    assert counters['vectorize.sentences'] == len(texts)
+    assert counters['select.scored'] == len(texts) and counters['select.exact'] == 1
+
+    collector = Collector()
+    summarize_with_sentences(texts, num_keywords=50, max_candidates=len(texts), instrument=collector)
+    assert 0 < collector.counters['select.scored'] <= len(texts)
+    assert collector.counters['select.exact'] == 1
+
+    records = []
+    wordrank_extractor = KRWordRank(min_count = 5, max_length = 10, n_jobs = 2,
+        instrument = lambda kind, name, value: records.append((kind, name, value)))
+    wordrank_extractor.extract(texts, engine='csr')
+    reported = {name:value for kind, name, value in records if kind == 'counter'}
+    for name in ['scan_vocabs.vocabs', 'construct_word_graph.links',
+        'construct_word_graph.dropped_links', 'construct_word_graph.edges']:
+        assert reported[name] == counters[name]
+
+def generate_links(extractor, doc):
+    # reference implementation of links of a document
+    tokens = doc.split()
+    links = []
+    for token in tokens:
+        links += extractor._intra_link(token)
+    if len(tokens) > 1:
+        tokens = [tokens[-1]] + tokens + [tokens[0]]
+        for i in range(1, len(tokens)-1):
+            links += extractor._rsub_to_token(tokens[i-1], tokens[i])
+            links += extractor._token_to_lsub(tokens[i], tokens[i+1])
+    return links
+
+def test_link_encoder(test_config, tmp_path):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+    texts += ['', '영화', '아주아주아주아주아주아주재밌는영화 최고']
+
+    wordrank_extractor = KRWordRank(min_count = 5, max_length = 10)
+    wordrank_extractor.train(texts)
+    wordrank_extractor.save(str(tmp_path / 'model'))
+    loaded = KRWordRank.load(str(tmp_path / 'model'))
+    # loaded model looks up subwords with binary search, thus it is checked with fewer texts
+    for extractor, texts_ in [(wordrank_extractor, texts), (loaded, texts[-300:])]:
+        encode = extractor._link_encoder(memo_size=100)
+        for text in texts_:
+            links = generate_links(extractor, text)
+            assert encode(text) == (extractor._encode_token(links), len(links))
+
+def test_keyword_filters(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    wordrank_extractor = KRWordRank(min_count = 2, max_length = 10)
+    rank, _ = wordrank_extractor.train(texts)
+    lset, rset = wordrank_extractor._split_rank(rank)
+
+    # previous implementation of the filters
+    def select_keywords(lset, rset):
+        keywords = {}
+        for word, r in sorted(lset.items(), key=lambda x:x[1], reverse=True):
+            if len(word) == 1:
+                continue
+            if not any((word[:e] in keywords) and (word[:e] in rset) for e in range(2, len(word))):
+                keywords[word] = r
+        return keywords
+
+    def filter_subtokens(keywords):
+        subtokens, keywords_ = set(), {}
+        for word, r in sorted(keywords.items(), key=lambda x:x[1], reverse=True):
+            subs = {word[:e] for e in range(2, len(word)+1)}
+            if not (subs & subtokens):
+                keywords_[word] = r
+                subtokens.update(subs)
+        return keywords_
+
+    keywords = wordrank_extractor._select_keywords(lset, rset)
+    assert list(keywords.items()) == list(select_keywords(lset, rset).items())
+    compounds = wordrank_extractor._filter_compounds(keywords)
+    assert list(compounds.items()) == list(wordrank_extractor._filter_compounds(keywords, is_sorted=True).items())
+    assert list(filter_subtokens(compounds).items()) == list(wordrank_extractor._filter_subtokens(compounds).items())
+
+def test_topk_keywords(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:3000]
+
+    wordrank_extractor = KRWordRank(min_count = 2, max_length = 10)
+    rank, _ = wordrank_extractor.train(texts)
+    # rounded rank has many ties
+    rounded = {idx:round(r, 1) for idx, r in rank.items()}
+
+    for rank_ in [rank, rounded]:
+        for num_rset, rset in [(-1, None), (30, None), (-1, {'은':1.0, '는':0.5, '영화':0.3})]:
+            keywords = wordrank_extractor._extract_keywords(rank_, -1, num_rset, rset)
+            for num_keywords in [1, 10, 50]:
+                expected = sorted(keywords.items(), key=lambda x:-x[1])[:num_keywords]
+                topk = wordrank_extractor._extract_keywords(rank_, num_keywords, num_rset, rset)
+                assert list(topk.items()) == expected
+
+def test_sweep(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:1000]
+
+    scores = []
+    def evaluate(keywords):
+        scores.append(len(keywords))
+        return len(keywords)
+
+    results = KRWordRank().sweep(texts, min_count=[5, 3], max_length=[6, 10], beta=0.85,
+        max_iter=[3, 10], num_rset=[-1, 30], num_keywords=30, engine='csr', evaluate=evaluate)
+    assert len(results) == len(scores) == 16
+    assert [r.score for r in results] == scores
+    for result in results:
+        wordrank_extractor = KRWordRank(min_count = result.min_count, max_length = result.max_length)
+        keywords, _, _ = wordrank_extractor.extract(texts, result.beta, result.max_iter,
+            num_keywords=30, num_rset=result.num_rset, engine='csr')
+        assert list(keywords.items()) == list(result.keywords.items())
+
+def test_extract_with_biases(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:1000]
+
+    biases = {'uniform': None, 'music': {'음악': 10.0, '노래': 5.0}, 'actor': {'배우': 10.0, '연기': 10.0}}
+    wordrank_extractor = KRWordRank(min_count = 5, max_length = 10)
+    keywords, ranks, graph = wordrank_extractor.extract_with_biases(texts, biases, max_iter=30, num_keywords=30)
+    assert list(keywords) == list(biases)
+    for key, bias in biases.items():
+        keywords_, rank, _ = KRWordRank(min_count = 5, max_length = 10).extract(
+            texts, 0.85, 30, num_keywords=30, bias=bias, engine='csr')
+        assert list(keywords_.items()) == list(keywords[key].items())
+        assert rank == ranks[key]
+
+    # reuse trained graph
+    keywords_, _, _ = wordrank_extractor.extract_with_biases(None, list(biases.values()), max_iter=30, num_keywords=30)
+    assert keywords_ == list(keywords.values())
+
+def test_async_summarizer(test_config):
+    data_path = test_config['data_path']
+    with open(data_path, encoding='utf-8') as f:
+        texts = [line.rsplit('\t')[0].strip() for line in f][:1000]
+
+    class StubExecutor(Executor):
+        # it records submitted functions, and runs them after release
+        def __init__(self):
+            self.calls = []
+            self.release = threading.Event()
+            self.pool = ThreadPoolExecutor(4)
+
+        def submit(self, fn, *args, **kwargs):
+            self.calls.append(fn.__name__)
+            def run():
+                self.release.wait()
+                return fn(*args, **kwargs)
+            return self.pool.submit(run)
+
+    async def run(executor):
+        summarizer = AsyncSummarizer(num_keywords=30, max_pending=2, max_queue=2, executor=executor)
+        requests = [asyncio.ensure_future(summarizer.keywords(texts)) for _ in range(3)]
+        requests.append(asyncio.ensure_future(summarizer.sentences(texts)))
+        requests.append(asyncio.ensure_future(summarizer.keywords(texts[:500])))
+        await asyncio.sleep(0.05)
+        # identical requests are coalesced, and max_pending jobs are submitted
+        assert summarizer.num_jobs == 3
+        assert executor.calls == ['_keywords', '_sentences']
+
+        # timed out job is cancelled before it is submitted
+        try:
+            await summarizer.keywords(texts[:300], timeout=0.05)
+            assert False
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0.05)
+        assert summarizer.num_jobs == 3
+
+        # identical request after cancellation does not join the cancelled job
+        request = asyncio.ensure_future(summarizer.keywords(texts[:300]))
+        await asyncio.sleep(0.01)
+        request.cancel()
+        requests.append(asyncio.ensure_future(summarizer.keywords(texts[:300])))
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        await asyncio.sleep(0.01)
+        assert not requests[-1].done()
+        assert summarizer.num_jobs == 4
+
+        # two jobs wait for executor, thus a new job is rejected, but coalesced one is not
+        with pytest.raises(asyncio.QueueFull):
+            await summarizer.keywords(texts[:200])
+        requests.append(asyncio.ensure_future(summarizer.keywords(texts[:300])))
+
+        executor.release.set()
+        results = await asyncio.gather(*requests)
+        assert executor.calls == ['_keywords', '_sentences', '_keywords', '_keywords']
+        assert summarizer.num_jobs == 0
+        await summarizer.close()
+        return results
+
+    executor = StubExecutor()
+    try:
+        results = asyncio.run(run(executor))
+    finally:
+        executor.release.set()
+        executor.pool.shutdown()
+    keywords = summarize_with_keywords(texts, num_keywords=30)
+    assert results[0] == results[1] == results[2] == keywords
+    assert results[3] == summarize_with_sentences(texts, num_keywords=30)
+    assert results[4] == summarize_with_keywords(texts[:500], num_keywords=30)
+    assert results[5] == results[6] == summarize_with_keywords(texts[:300], num_keywords=30)
+
+    with pytest.raises(ValueError):
+        AsyncSummarizer(max_queue=-1)